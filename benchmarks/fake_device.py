@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+"""
+假的 uiautomator2 设备
+用预先生成（或录制）的截图和层级模拟屏幕，按配置的延迟模拟 RPC 耗时，
+点击、滑动、返回和启动应用会在屏幕之间切换
+"""
+
+import base64
+import glob
+import io
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from xml.sax.saxutils import quoteattr
+from PIL import Image, ImageDraw
+from uiautomator2.abstract import ShellResponse
+
+
+# 各 RPC 的默认延迟(秒)，接近 USB 连接的真机
+DEFAULT_LATENCY = {
+    "info": 0.02,
+    "device_info": 0.03,
+    "app_current": 0.03,
+    "dump_hierarchy": 0.08,
+    "screenshot": 0.15,
+    "thumbnail": 0.03,
+    "screen_on": 0.03,
+    "click": 0.04,
+    "long_click": 0.04,
+    "double_click": 0.06,
+    "swipe": 0.04,
+    "press": 0.03,
+    "app_start": 0.3,
+    "app_stop": 0.1,
+    "app_list": 0.2,
+    "app_list_running": 0.1,
+    "shell": 0.08,
+    "broadcast": 0.05,
+    "set_input_ime": 0.4,
+    "current_ime": 0.08,
+    "send_keys": 0.03,
+    "clear_text": 0.03,
+    "get_text": 0.03,
+    "set_text": 0.05,
+}
+
+IME_ID = "com.github.uiautomator/.AdbKeyboard"
+
+LOCK_PACKAGE = "com.android.systemui"
+
+
+class Screen:
+    """一个屏幕：截图、层级 XML、OmniParser 元素以及点击/滑动后的跳转目标"""
+
+    def __init__(self,
+                 name: str,
+                 package: str,
+                 activity: str,
+                 image: Image.Image,
+                 hierarchy: str,
+                 elements: List[Dict],
+                 targets: Optional[Dict[Tuple[int, int, int, int], str]] = None,
+                 scroll_down: Optional[str] = None,
+                 scroll_up: Optional[str] = None):
+        """
+        Args:
+            name: 屏幕名称
+            package: 前台包名
+            activity: 前台 Activity
+            image: 截图
+            hierarchy: 层级 XML
+            elements: OmniParser 格式的元素（归一化 bbox）
+            targets: 点击区域 (x1, y1, x2, y2) -> 跳转的屏幕名称
+            scroll_down: 向上滑动（内容向下翻页）后的屏幕名称
+            scroll_up: 向下滑动后的屏幕名称
+        """
+        self.name = name
+        self.package = package
+        self.activity = activity
+        self.image = image
+        self.hierarchy = hierarchy
+        self.elements = elements
+        self.targets = targets or {}
+        self.scroll_down = scroll_down
+        self.scroll_up = scroll_up
+
+
+def make_screen(name: str,
+                package: str,
+                activity: str,
+                rows: List[str],
+                size: Tuple[int, int] = (1080, 1920),
+                color: Tuple[int, int, int] = (33, 150, 243),
+                targets: Optional[Dict[int, str]] = None,
+                lock: bool = False,
+                **kwargs) -> Screen:
+    """
+    生成一个列表样式的屏幕：顶部标题栏，下面每行一个可点击的列表项
+
+    Args:
+        rows: 列表项文本
+        targets: 列表项序号 -> 点击后跳转的屏幕名称
+        lock: 是否生成锁屏界面（带锁屏关键词、不可点击）
+    """
+    width, height = size
+    row_height = height // 12
+    image = Image.new("RGB", size, (250, 250, 250))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, width, row_height), fill=color)
+    draw.text((40, row_height // 3), name, fill=(255, 255, 255))
+
+    nodes = []
+    elements = [{
+        "type": "text",
+        "content": name,
+        "interactivity": False,
+        "bbox": [40 / width, 0.0, 0.5, row_height / height]
+    }]
+    screen_targets = {}
+    for i, text in enumerate(rows):
+        top = row_height * (i + 1)
+        bottom = top + row_height - 4
+        if bottom > height:
+            break
+        shade = 255 - (i * 7) % 40
+        draw.rectangle((0, top, width, bottom), fill=(shade, shade, 255))
+        draw.ellipse((30, top + 20, 30 + row_height - 40, bottom - 20), fill=color)
+        draw.text((row_height + 20, top + row_height // 3), text, fill=(20, 20, 20))
+
+        clickable = "false" if lock else "true"
+        nodes.append(
+            f'<node class="android.widget.LinearLayout" clickable="{clickable}" bounds="[0,{top}][{width},{bottom}]">'
+            f'<node class="android.widget.ImageView" resource-id="{package}:id/icon" bounds="[30,{top + 20}][{30 + row_height - 40},{bottom - 20}]" />'
+            f'<node class="android.widget.TextView" text={quoteattr(text)} bounds="[{row_height + 20},{top}][{width},{bottom}]" />'
+            f'</node>'
+        )
+        elements.append({
+            "type": "text",
+            "content": text,
+            "interactivity": not lock,
+            "bbox": [(row_height + 20) / width, top / height, 0.9, bottom / height]
+        })
+        elements.append({
+            "type": "icon",
+            "content": None,
+            "interactivity": not lock,
+            "bbox": [30 / width, (top + 20) / height, (30 + row_height - 40) / width, (bottom - 20) / height]
+        })
+        if targets and i in targets:
+            screen_targets[(0, top, width, bottom)] = targets[i]
+
+    hierarchy = (
+        '<?xml version="1.0" encoding="UTF-8"?><hierarchy rotation="0">'
+        f'<node class="android.widget.FrameLayout" package="{package}" bounds="[0,0][{width},{height}]">'
+        f'<node class="android.widget.TextView" text={quoteattr(name)} bounds="[40,0][{width // 2},{row_height}]" />'
+        + "".join(nodes) +
+        '</node></hierarchy>'
+    )
+    return Screen(name, package, activity, image, hierarchy, elements, screen_targets, **kwargs)
+
+
+def synthetic_screens(size: Tuple[int, int] = (1080, 1920)) -> Dict[str, Screen]:
+    """基准测试使用的一组屏幕：锁屏、桌面、设置列表（可翻页）、详情页、另一个应用"""
+    screens = [
+        make_screen("锁屏", LOCK_PACKAGE, "com.android.systemui.keyguard", ["12:00", "向上滑动解锁"],
+                    size=size, color=(0, 0, 0), lock=True),
+        make_screen("桌面", "com.android.launcher3", ".Launcher", ["设置", "日历", "相机", "时钟"],
+                    size=size, color=(76, 175, 80), targets={0: "设置"}),
+        make_screen("设置", "com.android.settings", ".Settings",
+                    ["网络和互联网", "已连接的设备", "应用", "通知", "电池", "存储", "声音", "显示", "壁纸", "无障碍"],
+                    size=size, targets={i: "详情" for i in range(10)}, scroll_down="设置2"),
+        make_screen("设置2", "com.android.settings", ".Settings",
+                    ["安全", "隐私", "位置信息", "账号", "系统", "关于手机", "提示", "开发者选项", "紧急信息", "更新"],
+                    size=size, targets={i: "详情" for i in range(10)}, scroll_up="设置", scroll_down="设置3"),
+        make_screen("设置3", "com.android.settings", ".Settings",
+                    ["数字健康", "Google", "多用户", "备份", "重置选项"],
+                    size=size, targets={i: "详情" for i in range(5)}, scroll_up="设置2"),
+        make_screen("详情", "com.android.settings", ".SubSettings",
+                    ["开关 A", "开关 B", "高级"], size=size, color=(255, 152, 0)),
+        make_screen("日历", "com.android.calendar", ".AllInOneActivity",
+                    ["今天", "明天", "本周", "本月"], size=size, color=(156, 39, 176)),
+    ]
+    return {screen.name: screen for screen in screens}
+
+
+def load_recording(directory: str) -> Dict[str, Screen]:
+    """
+    加载录制的屏幕：目录下每个屏幕一组 <名称>.png、<名称>.xml 和 <名称>.json，
+    json 包含 package、activity、elements（OmniParser 返回的元素）以及可选的 scroll_down/scroll_up
+    """
+    screens = {}
+    for meta_path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        name = os.path.splitext(os.path.basename(meta_path))[0]
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(os.path.join(directory, f"{name}.xml"), encoding="utf-8") as f:
+            hierarchy = f.read()
+        image = Image.open(os.path.join(directory, f"{name}.png")).convert("RGB")
+        screens[name] = Screen(name, meta["package"], meta["activity"], image, hierarchy, meta["elements"],
+                               scroll_down=meta.get("scroll_down"), scroll_up=meta.get("scroll_up"))
+    return screens
+
+
+class FakeDevice:
+    """实现 server.py 和 screen_utils.py 用到的 u2.Device 接口"""
+
+    def __init__(self,
+                 screens: Dict[str, Screen],
+                 start: str = "桌面",
+                 launchers: Optional[Dict[str, str]] = None,
+                 latency: Optional[Dict[str, float]] = None,
+                 latency_scale: float = 1.0,
+                 locked: bool = False,
+                 screen_off: bool = False,
+                 serial: str = "fake-device"):
+        """
+        Args:
+            screens: 屏幕名称 -> Screen
+            start: 初始屏幕
+            launchers: 包名 -> 启动后显示的屏幕名称，为空时使用该包的第一个屏幕
+            latency: 覆盖默认的 RPC 延迟(秒)
+            latency_scale: 所有延迟的倍数，0 表示不模拟延迟
+            locked: 初始是否在锁屏界面（向上滑动后解锁）
+            screen_off: 初始是否熄屏
+        """
+        self.screens = screens
+        self.serial = serial
+        self.latency = dict(DEFAULT_LATENCY, **(latency or {}))
+        self.latency_scale = latency_scale
+        self.launchers = launchers or {}
+        for screen in screens.values():
+            self.launchers.setdefault(screen.package, screen.name)
+        if start not in screens:
+            start = next(iter(screens))
+        self.home = start
+        self.current = "锁屏" if locked and "锁屏" in screens else start
+        self.unlock_to = start
+        self.screen_is_on = not screen_off
+        self.back_stack: List[str] = []
+        self.calls: Dict[str, int] = {}
+        # 当前输入法和焦点输入框的文本
+        self.ime = "com.android.inputmethod.latin/.LatinIME"
+        self.field_text = ""
+        self._lock = threading.Lock()
+
+    def _rpc(self, name: str):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+        delay = self.latency.get(name, 0.0) * self.latency_scale
+        if delay > 0:
+            time.sleep(delay)
+
+    @property
+    def screen(self) -> Screen:
+        return self.screens[self.current]
+
+    def _go(self, name: str, push: bool = True):
+        if name != self.current:
+            if push:
+                self.back_stack.append(self.current)
+            self.current = name
+
+    @property
+    def info(self) -> Dict:
+        self._rpc("info")
+        width, height = self.screen.image.size
+        return {
+            "currentPackageName": self.screen.package,
+            "displayHeight": height,
+            "displayWidth": width,
+            "displayRotation": 0,
+            "displaySizeDpX": width // 3,
+            "displaySizeDpY": height // 3,
+            "naturalOrientation": True,
+            "productName": "fake",
+            "screenOn": self.screen_is_on,
+            "sdkInt": 34,
+        }
+
+    @property
+    def device_info(self) -> Dict:
+        self._rpc("device_info")
+        return {"serial": self.serial, "brand": "Fake", "model": "Benchmark", "sdk": 34, "version": "14"}
+
+    def app_current(self) -> Dict:
+        self._rpc("app_current")
+        return {"package": self.screen.package, "activity": self.screen.activity, "pid": 1000}
+
+    def dump_hierarchy(self, compressed: bool = False, pretty: bool = False, max_depth: Optional[int] = None) -> str:
+        self._rpc("dump_hierarchy")
+        return self.screen.hierarchy
+
+    def screenshot(self, filename: Optional[str] = None, format: str = "pillow"):
+        self._rpc("screenshot")
+        return self.screen.image.copy()
+
+    @property
+    def jsonrpc(self) -> "FakeJsonRpc":
+        return FakeJsonRpc(self)
+
+    def screen_on(self):
+        self._rpc("screen_on")
+        self.screen_is_on = True
+
+    def click(self, x: int, y: int):
+        self._rpc("click")
+        for (x1, y1, x2, y2), target in self.screen.targets.items():
+            if x1 <= x <= x2 and y1 <= y <= y2:
+                self._go(target)
+                return
+
+    def long_click(self, x: int, y: int, duration: float = 0.5):
+        self._rpc("long_click")
+
+    def double_click(self, x: int, y: int, duration: float = 0.1):
+        self._rpc("double_click")
+
+    def swipe(self, fx, fy, tx, ty, duration: Optional[float] = None, steps: Optional[int] = None):
+        self._rpc("swipe")
+        if self.current == "锁屏":
+            if ty < fy:
+                self._go(self.unlock_to, push=False)
+            return
+        if ty < fy and self.screen.scroll_down:
+            self._go(self.screen.scroll_down, push=False)
+        elif ty > fy and self.screen.scroll_up:
+            self._go(self.screen.scroll_up, push=False)
+
+    def press(self, key: str):
+        self._rpc("press")
+        if key == "back" and self.back_stack:
+            self.current = self.back_stack.pop()
+        elif key == "home":
+            self.back_stack.clear()
+            self.current = self.home
+
+    def app_start(self, package_name: str, activity: Optional[str] = None, wait: bool = False, stop: bool = False):
+        self._rpc("app_start")
+        if package_name in self.launchers:
+            self._go(self.launchers[package_name])
+
+    def app_stop(self, package_name: str):
+        self._rpc("app_stop")
+        if self.screen.package == package_name:
+            self.back_stack.clear()
+            self.current = self.home
+
+    def app_list(self, filter: Optional[str] = None) -> List[str]:
+        self._rpc("app_list")
+        return sorted(self.launchers)
+
+    def app_list_running(self) -> List[str]:
+        self._rpc("app_list_running")
+        return [self.screen.package]
+
+    def shell(self, cmdargs, timeout: int = 60):
+        """只支持 pm list packages [-3] [--show-versioncode]，以及用 ; 连接的输入法广播和 sleep"""
+        self._rpc("shell")
+        if isinstance(cmdargs, str) and "am broadcast" in cmdargs:
+            return ShellResponse("".join(self._shell_step(step.split()) for step in cmdargs.split(";")), 0)
+        args = cmdargs.split() if isinstance(cmdargs, str) else list(cmdargs)
+        if args[:3] != ["pm", "list", "packages"]:
+            return ShellResponse("", 1)
+        packages = [p for p in sorted(self.launchers) if "-3" not in args or not p.startswith("com.android.")]
+        suffix = " versionCode:1" if "--show-versioncode" in args else ""
+        return ShellResponse("".join(f"package:{p}{suffix}\n" for p in packages), 0)
+
+    def _shell_step(self, args: List[str]) -> str:
+        if args[:1] == ["sleep"]:
+            time.sleep(float(args[1]) * self.latency_scale)
+            return ""
+        self._rpc("broadcast")
+        if self.ime != IME_ID:
+            # 没有接收者时广播结果为 0
+            return "Broadcast completed: result=0\n"
+        action = args[3]
+        if action == "ADB_KEYBOARD_CLEAR_TEXT":
+            self.field_text = ""
+        elif action == "ADB_KEYBOARD_INPUT_TEXT":
+            self.field_text += base64.b64decode(args[args.index("text") + 1]).decode("utf-8")
+        return "Broadcast completed: result=-1\n"
+
+    def current_ime(self) -> str:
+        self._rpc("current_ime")
+        return self.ime
+
+    def set_input_ime(self, enable: bool = True):
+        self._rpc("set_input_ime")
+        self.ime = IME_ID if enable else "com.android.inputmethod.latin/.LatinIME"
+
+    def send_keys(self, text: str, clear: bool = False):
+        self._rpc("send_keys")
+        self.field_text = text if clear else self.field_text + text
+
+    def clear_text(self):
+        self._rpc("clear_text")
+        self.field_text = ""
+
+    def __call__(self, **selector) -> "FocusedField":
+        """只支持 d(focused=True)"""
+        return FocusedField(self)
+
+
+class FakeJsonRpc:
+    """d.jsonrpc 中用到的方法"""
+
+    def __init__(self, device: FakeDevice):
+        self.device = device
+
+    def takeScreenshot(self, scale: float, quality: int) -> str:
+        """设备端缩放并压缩为 JPEG 的截图，base64 编码"""
+        self.device._rpc("thumbnail")
+        image = self.device.screen.image
+        size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+        buffer = io.BytesIO()
+        image.convert("RGB").resize(size, Image.BILINEAR).save(buffer, format="JPEG", quality=quality)
+        return base64.b64encode(buffer.getvalue()).decode()
+
+
+class FocusedField:
+    """焦点输入框"""
+
+    def __init__(self, device: FakeDevice):
+        self.device = device
+
+    def get_text(self) -> str:
+        self.device._rpc("get_text")
+        return self.device.field_text
+
+    def set_text(self, text: str):
+        self.device._rpc("set_text")
+        self.device.field_text = text or ""
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+基准测试入口
+使用假设备和本地 OmniParser 替身服务运行脚本化场景，输出每个工具的耗时分位数和吞吐量，
+不需要真机和 GPU
+
+    python benchmarks/run.py
+    python benchmarks/run.py --scenario click_loop --iterations 20 --json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Dict, List
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARK_DIR), "src"))
+
+from fake_device import FakeDevice, load_recording, synthetic_screens  # noqa: E402
+from scenarios import SCENARIOS  # noqa: E402
+from stub_parser import StubParser  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Hermetic android-control-mcp benchmarks")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="scenario to run (repeatable, default: all)")
+    parser.add_argument("--iterations", type=int, default=10, help="iterations per scenario")
+    parser.add_argument("--size", default="1080x1920", help="synthetic screen size WxH")
+    parser.add_argument("--recording", help="directory with recorded <name>.png/.xml/.json screens")
+    parser.add_argument("--latency-scale", type=float, default=1.0,
+                        help="multiplier for the fake device RPC latencies (0 disables them)")
+    parser.add_argument("--parser-delay", type=float, default=0.3, help="stub parser base inference delay (s)")
+    parser.add_argument("--parser-delay-per-mp", type=float, default=0.25,
+                        help="stub parser extra delay per megapixel (s)")
+    parser.add_argument("--no-batch-endpoint", action="store_true",
+                        help="stub parser answers 404 on /parse_batch (exercises the concurrent fallback)")
+    parser.add_argument("--parser-down", action="store_true",
+                        help="stop the stub parser before running (exercises the circuit breaker and degraded mode)")
+    parser.add_argument("--stages", action="store_true", help="also report per-stage latencies")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    return parser.parse_args()
+
+
+def print_report(report: Dict, stages: bool):
+    print(f"\n== {report['scenario']}: {report['description']}")
+    print(f"   {report['tool_calls']} calls in {report['wall_time']:.2f}s "
+          f"({report['throughput']:.2f} calls/s), {report['failures']} failed, "
+          f"{report['parser_requests']} parser requests")
+    sections = [("tool", report["tools"])]
+    if stages:
+        sections.append(("stage", report["stages"]))
+    for title, rows in sections:
+        print(f"   {title:<28}{'count':>7}{'p50':>10}{'p95':>10}{'p99':>10}{'mean':>10}")
+        for name, summary in rows.items():
+            print(f"   {name:<28}{summary['count']:>7}{summary['p50']:>10.1f}{summary['p95']:>10.1f}"
+                  f"{summary['p99']:>10.1f}{summary['mean']:>10.1f}")
+
+
+def main():
+    args = parse_args()
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    screens = load_recording(args.recording) if args.recording else synthetic_screens((width, height))
+
+    stub = StubParser(screens, base_delay=args.parser_delay,
+                      delay_per_megapixel=args.parser_delay_per_mp,
+                      batch=not args.no_batch_endpoint).start()
+    if args.parser_down:
+        stub.stop()
+
+    # 配置在导入时读取，必须先设置好环境变量
+    os.environ["ANDROID_MCP_OMNIPARSER_URL"] = stub.url
+    os.environ.setdefault("ANDROID_MCP_SAVE_IMAGES", "false")
+
+    import uiautomator2 as u2
+    from android_control_mcp import server
+    from android_control_mcp.device_session import registry
+    from android_control_mcp.metrics import metrics
+
+    reports: List[Dict] = []
+    try:
+        for name in args.scenario or list(SCENARIOS):
+            scenario = SCENARIOS[name]
+            device = FakeDevice(screens, start=scenario.start, latency_scale=args.latency_scale,
+                                locked=scenario.locked, screen_off=scenario.screen_off)
+            # 每个场景使用全新的会话（缓存、屏幕状态都从空开始）
+            u2.connect = lambda serial=None, device=device: device
+            registry.remove(None)
+            metrics.reset()
+            requests_before = stub.requests
+
+            started = time.perf_counter()
+            results = asyncio.run(scenario.run(server, device, args.iterations))
+            wall_time = time.perf_counter() - started
+
+            snapshot = metrics.snapshot()
+            report = {
+                "scenario": name,
+                "description": scenario.description,
+                "iterations": args.iterations,
+                "tool_calls": len(results),
+                "failures": sum(1 for result in results if not result.get("success")),
+                "errors": sorted({result["error"] for result in results if result.get("error")}),
+                "wall_time": round(wall_time, 3),
+                "throughput": round(len(results) / wall_time, 3) if wall_time > 0 else 0.0,
+                "parser_requests": stub.requests - requests_before,
+                "device_rpcs": dict(device.calls),
+                "tools": snapshot["tools"],
+                "stages": snapshot["stages"],
+            }
+            reports.append(report)
+            if not args.json:
+                print_report(report, args.stages)
+                for error in report["errors"]:
+                    print(f"   error: {error}")
+    finally:
+        if not args.parser_down:
+            stub.stop()
+
+    if args.json:
+        print(json.dumps(reports, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+基准测试场景
+每个场景从指定的初始屏幕开始，按脚本调用 MCP 工具
+"""
+
+from typing import Any, Awaitable, Callable, Dict, List
+
+
+class Scenario:
+    """一个脚本化的场景"""
+
+    def __init__(self,
+                 name: str,
+                 description: str,
+                 run: Callable[[Any, Any, int], Awaitable[List[Dict]]],
+                 start: str = "桌面",
+                 locked: bool = False,
+                 screen_off: bool = False):
+        """
+        Args:
+            name: 场景名称
+            description: 场景说明
+            run: async run(server, device, iterations)，返回全部工具响应
+            start: 初始屏幕
+            locked: 初始是否锁屏
+            screen_off: 初始是否熄屏
+        """
+        self.name = name
+        self.description = description
+        self.run = run
+        self.start = start
+        self.locked = locked
+        self.screen_off = screen_off
+
+
+def _row_center(device, row: int):
+    """列表第 row 项的中心坐标（与 fake_device.make_screen 的布局一致）"""
+    width, height = device.screen.image.size
+    row_height = height // 12
+    return width // 2, row_height * (row + 1) + row_height // 2
+
+
+async def click_loop(server, device, iterations: int) -> List[Dict]:
+    """在设置列表中点进详情页再返回"""
+    results = []
+    for i in range(iterations):
+        x, y = _row_center(device, i % 10)
+        results.append(await server.android_click(x=x, y=y))
+        results.append(await server.android_back())
+    return results
+
+
+async def scroll(server, device, iterations: int) -> List[Dict]:
+    """在三页的设置列表中上下翻页"""
+    results = []
+    for i in range(iterations):
+        direction = "up" if (i // 2) % 2 == 0 else "down"
+        results.append(await server.android_swipe(direction=direction))
+    return results
+
+
+async def app_launch(server, device, iterations: int) -> List[Dict]:
+    """在两个应用之间来回启动"""
+    packages = ["com.android.settings", "com.android.calendar"]
+    results = []
+    for i in range(iterations):
+        results.append(await server.android_launch_app(package_name=packages[i % 2]))
+    return results
+
+
+async def locked_start(server, device, iterations: int) -> List[Dict]:
+    """每次从熄屏锁屏状态开始获取屏幕信息（点亮、检测锁屏、滑动解锁、解析）"""
+    results = []
+    for _ in range(iterations):
+        device.current = "锁屏"
+        device.screen_is_on = False
+        results.append(await server.android_get_screen_info())
+    return results
+
+
+async def screen_info_loop(server, device, iterations: int) -> List[Dict]:
+    """在静止的屏幕上反复获取屏幕信息"""
+    results = []
+    for _ in range(iterations):
+        results.append(await server.android_get_screen_info())
+    return results
+
+
+async def batch(server, device, iterations: int) -> List[Dict]:
+    """批量执行点击和返回，只在最后截图一次"""
+    results = []
+    for i in range(iterations):
+        x, y = _row_center(device, i % 10)
+        actions = [
+            {"action": "click", "x": x, "y": y},
+            {"action": "wait", "settle": True},
+            {"action": "key", "key": "back"},
+            {"action": "wait", "settle": True},
+        ]
+        results.append(await server.android_batch(actions=actions))
+    return results
+
+
+async def scroll_to(server, device, iterations: int) -> List[Dict]:
+    """在三页的设置列表中滚动查找末尾、开头的列表项，以及一个不存在的列表项"""
+    targets = [("重置选项", "up", True), ("网络和互联网", "down", True), ("不存在的设置", "up", False)]
+    results = []
+    for i in range(iterations):
+        text, direction, expected = targets[i % len(targets)]
+        result = await server.android_scroll_to(text=text, direction=direction)
+        if result.get("success") and result["data"]["found"] != expected:
+            result = {"success": False, "error": f"{text}: found={result['data']['found']}"}
+        results.append(result)
+    return results
+
+
+async def app_search(server, device, iterations: int) -> List[Dict]:
+    """按名称、包名和拼音搜索应用"""
+    keywords = ["设置", "calendar", "shezhi", "launcher"]
+    results = []
+    for i in range(iterations):
+        results.append(await server.android_search_app(keyword=keywords[i % len(keywords)]))
+    return results
+
+
+async def text_input(server, device, iterations: int) -> List[Dict]:
+    """清空并输入一段中英文文本，交替使用快速和逐字输入，按焦点输入框的校验结果判断成败"""
+    results = []
+    for i in range(iterations):
+        text = f"hello 世界 {i:03d}"
+        result = await server.android_input_text(text=text, clear_before=True, slowly=i % 2 == 1)
+        if result.get("success") and not result["data"]["focused_field"]["verified"]:
+            result = {"success": False, "error": f"focused field is {result['data']['focused_field']['focused_text']!r}"}
+        results.append(result)
+    return results
+
+
+async def parse_many(server, device, iterations: int) -> List[Dict]:
+    """一次上传全部屏幕截图批量解析，按顺序核对每张图片的元素数量"""
+    from android_control_mcp.omniparser import get_parser
+    from android_control_mcp.screen_utils import encode_image
+    screens = list(device.screens.values())
+    images = [encode_image(screen.image, "png") for screen in screens]
+    results = []
+    for _ in range(iterations):
+        try:
+            parsed = get_parser().parse_many(images)
+            mismatched = [screen.name for screen, result in zip(screens, parsed)
+                          if len(result["elements"]) != len(screen.elements)]
+            if mismatched:
+                results.append({"success": False, "error": f"results out of order: {mismatched}"})
+            else:
+                results.append({"success": True})
+        except Exception as e:
+            results.append({"success": False, "error": str(e)})
+    return results
+
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in [
+        Scenario("click_loop", "click into a list item and go back", click_loop, start="设置"),
+        Scenario("scroll", "swipe through a three-page list", scroll, start="设置"),
+        Scenario("app_launch", "alternate launching two apps", app_launch),
+        Scenario("locked_start", "screen info from a screen-off, locked device", locked_start,
+                 locked=True, screen_off=True),
+        Scenario("screen_info", "repeated screen info on a static screen", screen_info_loop, start="设置"),
+        Scenario("batch", "click + back in one batch call", batch, start="设置"),
+        Scenario("scroll_to", "scroll a three-page list until an item is visible", scroll_to, start="设置"),
+        Scenario("app_search", "app searches against the cached catalog", app_search),
+        Scenario("text_input", "clear-and-set text entry, fast and typed", text_input, start="设置"),
+        Scenario("parse_many", "parse every screen in one batched parser call", parse_many),
+    ]
+}
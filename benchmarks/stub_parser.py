@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+本地 OmniParser 替身服务
+实现 GET /、POST /parse 和批量接口 POST /parse_batch：按上传图片匹配已知屏幕，回放对应的元素 JSON，
+并按图片面积模拟推理耗时（批量请求的图片合并推理，耗时按最大的一张计算）
+"""
+
+import io
+import json
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from PIL import Image, ImageChops, ImageStat
+
+
+# 匹配用的低分辨率尺寸
+_SIGNATURE_SIZE = (36, 64)
+
+
+def _signature(image: Image.Image) -> Image.Image:
+    return image.convert("L").resize(_SIGNATURE_SIZE, Image.BILINEAR)
+
+
+def read_uploads(content_type: str, body: bytes, name: str = "file") -> List[bytes]:
+    """从 multipart/form-data 请求体中按顺序取出全部名为 name 的字段"""
+    message = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + body)
+    return [part.get_payload(decode=True) for part in message.iter_parts()
+            if part.get_param("name", header="content-disposition") == name]
+
+
+def read_upload(content_type: str, body: bytes) -> Optional[bytes]:
+    """从 multipart/form-data 请求体中取出 file 字段"""
+    uploads = read_uploads(content_type, body)
+    return uploads[0] if uploads else None
+
+
+class StubParser:
+    """回放固定元素的 /parse 服务"""
+
+    def __init__(self,
+                 screens: Dict[str, "object"],
+                 base_delay: float = 0.3,
+                 delay_per_megapixel: float = 0.25,
+                 batch: bool = True,
+                 host: str = "127.0.0.1",
+                 port: int = 0):
+        """
+        Args:
+            screens: 屏幕名称 -> Screen（使用其 image 和 elements）
+            base_delay: 每次推理的固定耗时(秒)
+            delay_per_megapixel: 每百万像素额外的推理耗时(秒)，模拟耗时随图片面积增长
+            batch: 是否提供 /parse_batch，关闭时返回 404，模拟不支持批量的服务
+            host: 监听地址
+            port: 监听端口，0 表示随机端口
+        """
+        self.base_delay = base_delay
+        self.delay_per_megapixel = delay_per_megapixel
+        self.batch = batch
+        self._known: List[Tuple[Image.Image, Tuple[int, int], List[Dict]]] = [
+            (_signature(screen.image), screen.image.size, screen.elements) for screen in screens.values()
+        ]
+        self.requests = 0
+        self.batch_requests = 0
+        self.pixels = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubParser":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-parser", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def match(self, image: Image.Image) -> List[Dict]:
+        """整屏图片返回最相近屏幕的元素；尺寸不同（局部裁剪）时返回空列表"""
+        signature = _signature(image)
+        best, best_diff = [], None
+        for known_signature, size, elements in self._known:
+            if size != image.size:
+                continue
+            diff = ImageStat.Stat(ImageChops.difference(known_signature, signature)).mean[0]
+            if best_diff is None or diff < best_diff:
+                best, best_diff = elements, diff
+        return best
+
+    def result(self, image: Image.Image) -> Dict:
+        """与 OmniParser /parse 相同格式的解析结果"""
+        elements = self.match(image)
+        types: Dict[str, int] = {}
+        for element in elements:
+            types[element["type"]] = types.get(element["type"], 0) + 1
+        return {
+            "elements": elements,
+            "total_elements": len(elements),
+            "element_types": types
+        }
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, status: int, payload: Dict):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._reply(200, {"status": "ok"})
+
+            def do_POST(self):
+                path = self.path.split("?")[0]
+                batch = path == "/parse_batch"
+                if path != "/parse" and not (batch and stub.batch):
+                    self._reply(404, {"detail": "Not Found"})
+                    return
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                uploads = read_uploads(self.headers.get("Content-Type", ""), body, "files" if batch else "file")
+                if not uploads:
+                    self._reply(422, {"detail": "file is required"})
+                    return
+                images = [Image.open(io.BytesIO(data)) for data in uploads]
+                pixels = sum(image.width * image.height for image in images)
+                with stub._lock:
+                    stub.requests += 1
+                    stub.batch_requests += int(batch)
+                    stub.pixels += pixels
+                # 批量请求的图片在 GPU 上合并推理，耗时按最大的一张计算
+                largest = max(image.width * image.height for image in images)
+                time.sleep(stub.base_delay + stub.delay_per_megapixel * largest / 1_000_000)
+
+                results = [stub.result(image) for image in images]
+                self._reply(200, {"results": results} if batch else results[0])
+
+        return Handler
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+应用目录缓存
+通过 pm list packages 读取包名、版本号和是否为第三方应用，按 TTL 增量刷新；
+预先建立名称、拼音、包名的搜索索引，搜索不再需要访问设备
+"""
+
+import difflib
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+try:
+    from pypinyin import lazy_pinyin
+except ImportError:
+    # pypinyin 是可选依赖，未安装时不支持拼音搜索
+    lazy_pinyin = None
+
+
+# 常见应用的默认名称，可以通过标签文件覆盖或补充
+DEFAULT_LABELS = {
+    "com.tencent.mm": "微信",
+    "com.tencent.wework": "企业微信",
+    "com.tencent.mobileqq": "QQ",
+    "com.eg.android.AlipayGphone": "支付宝",
+    "com.taobao.taobao": "淘宝",
+    "com.sankuai.meituan": "美团",
+    "me.ele": "饿了么",
+    "com.android.settings": "设置",
+}
+
+# 模糊匹配的最低相似度
+FUZZY_THRESHOLD = 0.6
+
+_PACKAGE_LINE = re.compile(r"^package:(\S+?)(?:\s+versionCode:(\d+))?\s*$")
+
+
+def load_labels(path: str) -> Dict[str, str]:
+    """读取 {包名: 应用名称} 格式的标签文件，不存在或格式错误时返回空字典"""
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            labels = json.load(f)
+        return {str(k): str(v) for k, v in labels.items()}
+    except (OSError, ValueError, AttributeError) as e:
+        print(f"读取应用标签文件失败: {e}")
+        return {}
+
+
+def parse_package_list(output: str) -> Dict[str, Optional[int]]:
+    """
+    解析 pm list packages [--show-versioncode] 的输出
+
+    Returns:
+        dict: 包名 -> 版本号（不支持 --show-versioncode 时为 None）
+    """
+    packages = {}
+    for line in output.splitlines():
+        match = _PACKAGE_LINE.match(line.strip())
+        if match:
+            packages[match.group(1)] = int(match.group(2)) if match.group(2) else None
+    return packages
+
+
+def _bigrams(text: str) -> Set[str]:
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+class AppEntry:
+    """目录中的一个应用及其搜索关键词"""
+
+    def __init__(self, package: str, version_code: Optional[int], user_app: bool, label: Optional[str]):
+        self.package = package
+        self.version_code = version_code
+        self.user_app = user_app
+        self.label = label
+
+        # 包名去掉常见前缀后按 "." 切分，如 com.tencent.mm -> tencent, mm
+        parts = [p for p in package.lower().split(".") if p not in ("com", "android", "app", "cn", "org")]
+        self.keys: Dict[str, str] = {"package": package.lower()}
+        if label:
+            self.keys["label"] = label.lower()
+            if lazy_pinyin is not None:
+                syllables = lazy_pinyin(label)
+                self.keys["pinyin"] = "".join(syllables).lower()
+                self.keys["initials"] = "".join(s[0] for s in syllables if s).lower()
+        self.parts = parts
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "package": self.package,
+            "label": self.label,
+            "version_code": self.version_code,
+            "user_app": self.user_app,
+        }
+
+
+class AppCatalog:
+    """单个设备的应用目录"""
+
+    def __init__(self, ttl: float = 300.0, labels_file: str = ""):
+        """
+        Args:
+            ttl: 目录有效期(秒)，过期后下次访问时增量刷新
+            labels_file: {包名: 应用名称} 格式的 JSON 文件，补充或覆盖默认名称
+        """
+        self.ttl = ttl
+        self.labels = dict(DEFAULT_LABELS, **load_labels(labels_file))
+        self._entries: Dict[str, AppEntry] = {}
+        self._index: Dict[str, Set[str]] = {}
+        self._refreshed_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _index_entry(self, entry: AppEntry):
+        for key in entry.keys.values():
+            for gram in _bigrams(key):
+                self._index.setdefault(gram, set()).add(entry.package)
+
+    def _unindex_entry(self, entry: AppEntry):
+        for key in entry.keys.values():
+            for gram in _bigrams(key):
+                packages = self._index.get(gram)
+                if packages is not None:
+                    packages.discard(entry.package)
+                    if not packages:
+                        del self._index[gram]
+
+    def refresh(self, shell: Callable[[List[str]], str], force: bool = False) -> Dict[str, int]:
+        """
+        读取设备上的应用列表，只为新增、删除或版本变化的应用更新索引
+
+        Args:
+            shell: 执行 shell 命令并返回输出的函数
+            force: 是否忽略有效期强制刷新
+
+        Returns:
+            dict: 本次新增、删除、更新的数量
+        """
+        with self._lock:
+            if not force and self._refreshed_at is not None and time.monotonic() - self._refreshed_at < self.ttl:
+                return {"added": 0, "removed": 0, "updated": 0}
+
+            packages = parse_package_list(shell(["pm", "list", "packages", "--show-versioncode"]))
+            if not packages:
+                # Android 9 以下不支持 --show-versioncode
+                packages = parse_package_list(shell(["pm", "list", "packages"]))
+            third_party = set(parse_package_list(shell(["pm", "list", "packages", "-3"])))
+
+            removed = [p for p in self._entries if p not in packages]
+            for package in removed:
+                self._unindex_entry(self._entries.pop(package))
+
+            added = updated = 0
+            for package, version_code in packages.items():
+                user_app = package in third_party
+                entry = self._entries.get(package)
+                if entry is not None:
+                    if entry.version_code == version_code and entry.user_app == user_app:
+                        continue
+                    self._unindex_entry(entry)
+                    updated += 1
+                else:
+                    added += 1
+                entry = AppEntry(package, version_code, user_app, self.labels.get(package))
+                self._entries[package] = entry
+                self._index_entry(entry)
+
+            self._refreshed_at = time.monotonic()
+            if self._entries and (added or removed or updated):
+                print(f"应用目录已刷新: 新增 {added}，删除 {len(removed)}，更新 {updated}")
+            return {"added": added, "removed": len(removed), "updated": updated}
+
+    def invalidate(self):
+        """下次访问时重新读取应用列表"""
+        self._refreshed_at = None
+
+    def apps(self, user_only: bool = False) -> List[AppEntry]:
+        """目录中的应用，按包名排序"""
+        entries = sorted(self._entries.values(), key=lambda e: e.package)
+        if user_only:
+            entries = [e for e in entries if e.user_app]
+        return entries
+
+    def get(self, package: str) -> Optional[AppEntry]:
+        return self._entries.get(package)
+
+    def _score(self, entry: AppEntry, query: str) -> float:
+        label = entry.keys.get("label")
+        if label == query:
+            return 100.0
+        if label and label.startswith(query):
+            return 90.0
+        if label and query in label:
+            return 80.0
+        if query in (entry.keys.get("pinyin"), entry.keys.get("initials")):
+            return 75.0
+        if entry.keys.get("pinyin", "").startswith(query):
+            return 70.0
+        if query in entry.parts:
+            return 65.0
+        if query in entry.keys["package"]:
+            return 60.0
+        if query in entry.keys.get("pinyin", ""):
+            return 55.0
+        return 0.0
+
+    def search(self, keyword: str, limit: int = 20) -> List[Tuple[AppEntry, float]]:
+        """
+        按名称、拼音、包名搜索，没有直接命中时做模糊匹配
+
+        Args:
+            keyword: 搜索关键词
+            limit: 最多返回的数量
+
+        Returns:
+            list: (应用, 得分) 按得分从高到低排列
+        """
+        query = keyword.strip().lower()
+        if not query:
+            return []
+        with self._lock:
+            candidates: Optional[Set[str]] = None
+            for gram in _bigrams(query):
+                packages = self._index.get(gram, set())
+                candidates = set(packages) if candidates is None else candidates & packages
+                if not candidates:
+                    break
+
+            scored = []
+            for package in candidates or ():
+                entry = self._entries[package]
+                score = self._score(entry, query)
+                if score > 0:
+                    scored.append((entry, score))
+
+            if not scored:
+                # 模糊匹配：与名称、拼音或包名片段的相似度
+                for entry in self._entries.values():
+                    keys = [v for k, v in entry.keys.items() if k != "package"] + entry.parts
+                    ratio = max((difflib.SequenceMatcher(None, query, key).ratio() for key in keys), default=0.0)
+                    if ratio >= FUZZY_THRESHOLD:
+                        scored.append((entry, round(ratio * 50, 1)))
+
+        scored.sort(key=lambda item: (-item[1], item[0].package))
+        return scored[:limit]
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+截图后端
+默认使用 d.screenshot()；stream 后端保持一路 H.264 视频流，后台持续解码到环形缓冲区，
+取帧时直接返回最新一帧，视频流不可用时回退到 d.screenshot()
+"""
+
+import base64
+import collections
+import io
+import os
+import subprocess
+import threading
+import time
+from typing import Any, Deque, List, Optional, Tuple, Union
+import uiautomator2 as u2
+from PIL import Image
+
+try:
+    import av
+except ImportError:
+    # PyAV 是可选依赖，未安装时只能使用 screenshot 后端
+    av = None
+
+
+CAPTURE_BACKENDS = ("screenshot", "stream")
+
+
+def screenrecord_command(serial: Optional[str] = None) -> List[str]:
+    """通过 adb screenrecord 输出原始 H.264 流的命令"""
+    command = ["adb"]
+    if serial:
+        command += ["-s", serial]
+    return command + ["exec-out", "screenrecord", "--output-format=h264", "-"]
+
+
+class FrameBuffer:
+    """保存最近若干帧的环形缓冲区"""
+
+    def __init__(self, size: int = 8):
+        self._frames: Deque[Tuple[float, Image.Image]] = collections.deque(maxlen=max(size, 1))
+        self._condition = threading.Condition()
+
+    def push(self, frame: Image.Image):
+        with self._condition:
+            self._frames.append((time.monotonic(), frame))
+            self._condition.notify_all()
+
+    def clear(self):
+        with self._condition:
+            self._frames.clear()
+
+    def latest(self) -> Optional[Tuple[float, Image.Image]]:
+        """最新一帧 (接收时间, 图片)，没有帧时返回 None"""
+        with self._condition:
+            return self._frames[-1] if self._frames else None
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+
+class StreamCapture:
+    """后台解码 H.264 视频流，把帧写入环形缓冲区"""
+
+    def __init__(self,
+                 source: Union[str, List[str]],
+                 buffer_size: int = 8,
+                 realtime: Optional[bool] = None,
+                 restart_delay: float = 1.0):
+        """
+        Args:
+            source: 录制好的视频文件路径（作为替身设备循环播放），或输出 H.264 流的命令
+            buffer_size: 环形缓冲区保存的帧数
+            realtime: 是否按时间戳节奏解码，默认文件为 True、命令为 False
+            restart_delay: 视频流中断后重新打开前的等待(秒)
+        """
+        if av is None:
+            raise RuntimeError("PyAV is not installed, run: pip install av")
+        self.source = source
+        self.is_file = isinstance(source, str)
+        self.realtime = self.is_file if realtime is None else realtime
+        self.restart_delay = restart_delay
+        self.buffer = FrameBuffer(buffer_size)
+        self.frames_decoded = 0
+        self.last_error: Optional[str] = None
+        self._process: Optional[subprocess.Popen] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """启动后台解码线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stream-capture", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止解码并关闭视频流"""
+        self._stop.set()
+        self._kill_process()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        self.buffer.clear()
+
+    @property
+    def alive(self) -> bool:
+        """解码线程在运行且已经收到画面"""
+        return self._thread is not None and self._thread.is_alive() and len(self.buffer) > 0
+
+    def latest_frame(self) -> Optional[Image.Image]:
+        """最新一帧，没有时返回 None"""
+        latest = self.buffer.latest()
+        return latest[1] if latest else None
+
+    def _kill_process(self):
+        process, self._process = self._process, None
+        if process is not None and process.poll() is None:
+            process.kill()
+
+    def _open(self) -> Any:
+        if self.is_file:
+            return av.open(self.source)
+        self._process = subprocess.Popen(self.source, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        return av.open(self._process.stdout, format="h264")
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                container = self._open()
+                try:
+                    self._decode(container)
+                finally:
+                    container.close()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"视频流解码失败: {e}")
+            finally:
+                self._kill_process()
+
+            if self._stop.is_set():
+                break
+            if not self.is_file:
+                # 设备端重新开始录制，旧画面可能已经过期
+                self.buffer.clear()
+                self._stop.wait(self.restart_delay)
+
+    def _decode(self, container: Any):
+        started = time.monotonic()
+        for frame in container.decode(video=0):
+            if self._stop.is_set():
+                return
+            if self.realtime and frame.time is not None:
+                delay = started + frame.time - time.monotonic()
+                if delay > 0:
+                    self._stop.wait(delay)
+            self.buffer.push(frame.to_image())
+            self.frames_decoded += 1
+
+
+class FrameGrabber:
+    """单个设备的取帧入口，按配置选择后端并在视频流不可用时回退"""
+
+    def __init__(self,
+                 backend: str = "screenshot",
+                 source: str = "",
+                 buffer_size: int = 8,
+                 sample_scale: float = 0.1,
+                 sample_quality: int = 30,
+                 reuse_age: float = 0.3):
+        """
+        Args:
+            backend: screenshot 或 stream
+            source: stream 后端的视频文件路径，为空时使用 adb screenrecord
+            buffer_size: 环形缓冲区保存的帧数
+            sample_scale: 变化检测用缩略图相对屏幕的缩放比例
+            sample_quality: 缩略图的 JPEG 质量
+            reuse_age: 最近一次全分辨率采样帧可以直接作为截图复用的时间(秒)
+        """
+        if backend not in CAPTURE_BACKENDS:
+            raise ValueError(f"Invalid capture backend: {backend}")
+        self.backend = backend
+        self.source = source
+        self.buffer_size = buffer_size
+        self._stream: Optional[StreamCapture] = None
+        self.sample_scale = sample_scale
+        self.sample_quality = sample_quality
+        self.reuse_age = reuse_age
+        self._lock = threading.Lock()
+        self._disabled = False
+        # 不支持缩略图截图的设备对象，重连后重新尝试
+        self._no_thumbnail: Any = None
+        # 最近一次全分辨率采样帧 (采样时间, 图片)
+        self._sampled: Optional[Tuple[float, Image.Image]] = None
+
+    def _ensure_stream(self, serial: Optional[str]) -> Optional[StreamCapture]:
+        if self._disabled:
+            return None
+        if self._stream is None:
+            with self._lock:
+                if self._stream is None:
+                    if av is None:
+                        print("未安装 PyAV，视频流截图不可用，使用 d.screenshot()")
+                        self._disabled = True
+                        return None
+                    if self.source and not os.path.exists(self.source):
+                        print(f"视频文件不存在: {self.source}，使用 d.screenshot()")
+                        self._disabled = True
+                        return None
+                    self._stream = StreamCapture(self.source or screenrecord_command(serial),
+                                                 buffer_size=self.buffer_size)
+                    self._stream.start()
+        return self._stream
+
+    def grab(self, session: Any) -> Image.Image:
+        """
+        获取当前画面
+
+        Args:
+            session: 设备会话
+
+        Returns:
+            Image: 与 d.screenshot() 相同尺寸的截图
+        """
+        # 界面稳定检测刚采到的全分辨率帧，直接使用（一次性）
+        sampled, self._sampled = self._sampled, None
+        if sampled is not None and time.monotonic() - sampled[0] <= self.reuse_age:
+            return sampled[1]
+        frame = self._stream_frame(session)
+        if frame is not None:
+            return frame
+        return session.call(lambda d: d.screenshot())
+
+    def _stream_frame(self, session: Any) -> Optional[Image.Image]:
+        """视频流的最新一帧（屏幕坐标系），不可用时返回 None"""
+        if self.backend != "stream":
+            return None
+        stream = self._ensure_stream(session.serial)
+        if stream is None:
+            return None
+        stream.start()
+        frame = stream.latest_frame() if stream.alive else None
+        size = session.display_size()
+        # 横竖屏切换后视频流方向可能与屏幕不一致，此时回退到截图
+        if frame is None or (frame.width > frame.height) != (size[0] > size[1]):
+            return None
+        # 视频流分辨率可能低于屏幕，缩放到屏幕坐标系
+        if frame.size != size:
+            frame = frame.resize(size, Image.BILINEAR)
+        return frame
+
+    def sample(self, session: Any) -> Optional[Image.Image]:
+        """
+        获取用于变化检测的廉价画面，不做全分辨率截图
+
+        视频流可用时返回最新一帧（并留给下一次 grab() 复用），否则请求设备端缩放、
+        低质量 JPEG 压缩的缩略图；两者都不可用时返回 None
+
+        Args:
+            session: 设备会话
+
+        Returns:
+            Image: 画面或缩略图，只用于比较
+        """
+        frame = self._stream_frame(session)
+        if frame is not None:
+            self._sampled = (time.monotonic(), frame)
+            return frame
+        device = session.device
+        if self._no_thumbnail is device:
+            return None
+        try:
+            data = session.call(lambda d: d.jsonrpc.takeScreenshot(self.sample_scale, self.sample_quality))
+        except u2.exceptions.RPCError:
+            data = None
+        if not data:
+            print("设备不支持缩略图截图，界面稳定检测不使用画面信号")
+            self._no_thumbnail = device
+            return None
+        return Image.open(io.BytesIO(base64.b64decode(data)))
+
+    def close(self):
+        """停止视频流"""
+        with self._lock:
+            if self._stream is not None:
+                self._stream.stop()
+                self._stream = None
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+截图存储
+截图和标注图片统一写入专用目录，使用唯一 ID 命名，按数量、总大小和保存时间淘汰最久未使用的文件；
+内存索引支持按 ID 和时间查找，启动时从目录重建
+"""
+
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional
+from . import config
+
+
+# 文件名: <ID>_<类型>.<扩展名>，ID 以毫秒时间戳开头便于排序
+_FILE_PATTERN = re.compile(r"^(\d{8}-\d{6}-\d{3}-[0-9a-f]{6})_(\w+)\.(\w+)$")
+
+
+def new_capture_id() -> str:
+    """生成唯一的截图 ID，如 20250101-120000-123-1a2b3c"""
+    now = datetime.now()
+    return f"{now:%Y%m%d-%H%M%S}-{now.microsecond // 1000:03d}-{uuid.uuid4().hex[:6]}"
+
+
+class CaptureRecord:
+    """一个已保存的文件"""
+
+    def __init__(self, capture_id: str, kind: str, path: str, created: float, size: int):
+        self.capture_id = capture_id
+        self.kind = kind
+        self.path = path
+        self.created = created
+        self.size = size
+
+    def as_dict(self) -> Dict:
+        return {
+            "capture_id": self.capture_id,
+            "kind": self.kind,
+            "path": self.path,
+            "created": datetime.fromtimestamp(self.created).isoformat(timespec="milliseconds"),
+            "size": self.size,
+        }
+
+
+class CaptureStore:
+    """有上限的截图目录，超过数量、大小或保存时间时按最久未使用淘汰"""
+
+    def __init__(self,
+                 directory: str,
+                 max_files: int = 200,
+                 max_bytes: int = 200 * 1024 * 1024,
+                 max_age: float = 3600.0,
+                 enabled: bool = True):
+        """
+        Args:
+            directory: 存储目录
+            max_files: 最多保存的文件数，0 表示不限制
+            max_bytes: 文件总大小上限(字节)，0 表示不限制
+            max_age: 文件最长保存时间(秒)，0 表示不限制
+            enabled: 是否写入磁盘，关闭时 save() 返回 None
+        """
+        self.directory = directory
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.enabled = enabled
+        # (ID, 类型) -> 记录，按最近使用顺序排列
+        self._records: "OrderedDict[tuple, CaptureRecord]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        if enabled:
+            os.makedirs(directory, exist_ok=True)
+            self._load()
+
+    def _load(self):
+        """扫描目录重建索引（上次运行留下的文件同样受上限约束）"""
+        records = []
+        for name in os.listdir(self.directory):
+            match = _FILE_PATTERN.match(name)
+            if not match:
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            records.append(CaptureRecord(match.group(1), match.group(2), path, stat.st_mtime, stat.st_size))
+        records.sort(key=lambda r: (r.created, r.capture_id))
+        with self._lock:
+            for record in records:
+                self._records[(record.capture_id, record.kind)] = record
+                self._total_bytes += record.size
+            self._evict()
+
+    def _remove(self, key: tuple):
+        record = self._records.pop(key)
+        self._total_bytes -= record.size
+        try:
+            os.remove(record.path)
+        except OSError:
+            pass
+
+    def _evict(self, keep: Optional[tuple] = None):
+        """在锁内调用：删除过期文件，再按最久未使用删除超出上限的文件（keep 指定的文件始终保留）"""
+        if self.max_age > 0:
+            cutoff = time.time() - self.max_age
+            for key in [k for k, r in self._records.items() if r.created < cutoff and k != keep]:
+                self._remove(key)
+        for key in list(self._records):
+            if not ((self.max_files > 0 and len(self._records) > self.max_files)
+                    or (self.max_bytes > 0 and self._total_bytes > self.max_bytes)):
+                break
+            if key != keep:
+                self._remove(key)
+
+    def save(self, data: bytes, kind: str, extension: str, capture_id: Optional[str] = None) -> Optional[CaptureRecord]:
+        """
+        保存一个文件
+
+        Args:
+            data: 文件内容
+            kind: 类型，如 screen、labeled
+            extension: 扩展名
+            capture_id: 截图 ID，同一次截图的原图和标注图使用同一个 ID；为空时生成新 ID
+
+        Returns:
+            CaptureRecord: 保存的记录，关闭持久化时返回 None
+        """
+        if not self.enabled:
+            return None
+        capture_id = capture_id or new_capture_id()
+        path = os.path.join(self.directory, f"{capture_id}_{kind}.{extension}")
+        with open(path, "wb") as f:
+            f.write(data)
+        record = CaptureRecord(capture_id, kind, path, time.time(), len(data))
+        with self._lock:
+            key = (capture_id, kind)
+            if key in self._records:
+                self._total_bytes -= self._records.pop(key).size
+            self._records[key] = record
+            self._total_bytes += record.size
+            self._evict(keep=key)
+        return record
+
+    def get(self, capture_id: str, kind: str = "screen") -> Optional[CaptureRecord]:
+        """按 ID 查找，命中时标记为最近使用"""
+        with self._lock:
+            key = (capture_id, kind)
+            record = self._records.get(key)
+            if record is None:
+                return None
+            if not os.path.exists(record.path):
+                self._total_bytes -= self._records.pop(key).size
+                return None
+            self._records.move_to_end(key)
+            return record
+
+    def find(self,
+             since: Optional[float] = None,
+             until: Optional[float] = None,
+             kind: Optional[str] = None,
+             limit: int = 20) -> List[CaptureRecord]:
+        """
+        按时间查找，最新的在前
+
+        Args:
+            since: 起始时间戳(秒)
+            until: 结束时间戳(秒)
+            kind: 只返回该类型
+            limit: 最多返回的数量
+        """
+        with self._lock:
+            records = list(self._records.values())
+        records = [r for r in records
+                   if (since is None or r.created >= since)
+                   and (until is None or r.created <= until)
+                   and (kind is None or r.kind == kind)]
+        records.sort(key=lambda r: (r.created, r.capture_id), reverse=True)
+        return records[:limit]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "directory": self.directory,
+                "files": len(self._records),
+                "bytes": self._total_bytes,
+            }
+
+
+# 进程内共享的存储
+_store: Optional[CaptureStore] = None
+_store_lock = threading.Lock()
+
+
+def get_capture_store() -> CaptureStore:
+    """获取按配置创建的截图存储"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = CaptureStore(
+                    config.CAPTURE_DIR or os.path.join(tempfile.gettempdir(), "android-control-mcp"),
+                    max_files=config.CAPTURE_MAX_FILES,
+                    max_bytes=int(config.CAPTURE_MAX_MB * 1024 * 1024),
+                    max_age=config.CAPTURE_MAX_AGE,
+                    enabled=config.CAPTURE_PERSIST
+                )
+    return _store
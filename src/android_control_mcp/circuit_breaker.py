@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+熔断器
+连续失败达到阈值后断开，冷却期内的请求直接失败；冷却结束后放行一个试探请求，
+成功则恢复，失败则重新断开
+"""
+
+import threading
+import time
+from typing import Dict
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """线程安全的三态熔断器"""
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        """
+        Args:
+            failure_threshold: 连续失败多少次后断开，0 表示不熔断
+            reset_timeout: 断开后多久(秒)放行试探请求
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def is_open(self) -> bool:
+        """是否处于冷却期（不占用试探名额）"""
+        return self.state == OPEN
+
+    def allow(self) -> bool:
+        """请求前调用：是否可以发送；冷却结束后只放行一个试探请求"""
+        if self.failure_threshold <= 0:
+            return True
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = HALF_OPEN
+                self._probing = False
+            # 试探请求没有回报结果时，冷却时间后允许再次试探
+            if self._probing and time.monotonic() - self._probe_started < self.reset_timeout:
+                return False
+            self._probing = True
+            self._probe_started = time.monotonic()
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                print("OmniParser 已恢复，熔断器闭合")
+            self._state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or (
+                    self.failure_threshold > 0 and self._failures >= self.failure_threshold):
+                self._open(f"连续失败 {self._failures} 次")
+
+    def trip(self):
+        """立即断开（如后台健康检查发现服务不可达）"""
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            if self._state == CLOSED:
+                self._open("服务不可达")
+
+    def _open(self, reason: str):
+        if self._state != OPEN:
+            print(f"OmniParser {reason}，熔断 {self.reset_timeout:g} 秒")
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._probing = False
+
+    def snapshot(self) -> Dict:
+        state = self.state
+        with self._lock:
+            return {"state": state, "failures": self._failures}
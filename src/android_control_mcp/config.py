@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+运行配置
+所有配置项都可以通过 ANDROID_MCP_ 前缀的环境变量覆盖
+"""
+
+import os
+
+
+def env_str(name: str, default: str) -> str:
+    """读取字符串配置"""
+    return os.environ.get(f"ANDROID_MCP_{name}", default)
+
+
+def env_bool(name: str, default: bool) -> bool:
+    """读取布尔配置，接受 1/true/yes/on"""
+    value = os.environ.get(f"ANDROID_MCP_{name}")
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def env_int(name: str, default: int) -> int:
+    """读取整数配置"""
+    value = os.environ.get(f"ANDROID_MCP_{name}")
+    return int(value) if value else default
+
+
+def env_float(name: str, default: float) -> float:
+    """读取浮点数配置"""
+    value = os.environ.get(f"ANDROID_MCP_{name}")
+    return float(value) if value else default
+
+
+# 截图上传编码格式 (png/jpeg/webp) 和有损格式的质量
+IMAGE_FORMAT = env_str("IMAGE_FORMAT", "png").lower()
+IMAGE_QUALITY = env_int("IMAGE_QUALITY", 85)
+
+# 是否把原始截图写入磁盘（默认关闭，整个流程只在内存中进行）
+SAVE_IMAGES = env_bool("SAVE_IMAGES", False)
+
+# OmniParser 服务地址、超时和连接池
+OMNIPARSER_URL = env_str("OMNIPARSER_URL", "http://localhost:8000")
+OMNIPARSER_CONNECT_TIMEOUT = env_float("OMNIPARSER_CONNECT_TIMEOUT", 3.0)
+OMNIPARSER_READ_TIMEOUT = env_float("OMNIPARSER_READ_TIMEOUT", 30.0)
+OMNIPARSER_POOL_SIZE = env_int("OMNIPARSER_POOL_SIZE", 4)
+# 后台健康检查间隔(秒)，0 表示关闭
+OMNIPARSER_HEALTH_INTERVAL = env_float("OMNIPARSER_HEALTH_INTERVAL", 30.0)
+# 一次上传多张图片的批量接口路径，为空时只使用 /parse（多张图片并发发送）
+OMNIPARSER_BATCH_ENDPOINT = env_str("OMNIPARSER_BATCH_ENDPOINT", "/parse_batch")
+# 熔断：连续失败次数阈值(0 关闭)、熔断后放行试探请求的间隔(秒)；
+# OmniParser 不可用时是否降级为只用界面层级提取元素（响应中带 degraded 标记）
+OMNIPARSER_BREAKER_THRESHOLD = env_int("OMNIPARSER_BREAKER_THRESHOLD", 3)
+OMNIPARSER_BREAKER_RESET = env_float("OMNIPARSER_BREAKER_RESET", 30.0)
+DEGRADED_MODE = env_bool("DEGRADED_MODE", True)
+
+# 解析结果缓存：容量(0 关闭)、有效期(秒)、感知哈希距离阈值(位)
+PARSE_CACHE_SIZE = env_int("PARSE_CACHE_SIZE", 32)
+PARSE_CACHE_TTL = env_float("PARSE_CACHE_TTL", 300.0)
+PARSE_CACHE_THRESHOLD = env_int("PARSE_CACHE_THRESHOLD", 3)
+
+# 最近一次屏幕状态的最长复用时间(秒)，0 表示不复用
+SCREEN_STATE_MAX_AGE = env_float("SCREEN_STATE_MAX_AGE", 60.0)
+
+# 前台包名确认未锁屏后跳过锁屏检测的时间窗口(秒)，0 表示每次都检测
+LOCK_CHECK_TTL = env_float("LOCK_CHECK_TTL", 3.0)
+
+# 执行阻塞设备操作的线程池大小
+TOOL_WORKERS = env_int("TOOL_WORKERS", 8)
+
+# 工具返回屏幕信息的默认模式: full=完整元素列表, delta=只返回相对上一次截图的变化
+RESPONSE_MODE = env_str("RESPONSE_MODE", "full").lower()
+
+# 元素格式: full=元素字典列表, compact=共享表头加每个元素一行；元素数量和字节预算，0 表示不限制
+PAYLOAD_FORMAT = env_str("PAYLOAD_FORMAT", "full").lower()
+PAYLOAD_MAX_ELEMENTS = env_int("PAYLOAD_MAX_ELEMENTS", 0)
+PAYLOAD_MAX_BYTES = env_int("PAYLOAD_MAX_BYTES", 0)
+
+# 操作后等待界面稳定：最长等待(秒)、启动应用时的最长等待(秒)、
+# 需要连续一致的采样次数、采样间隔(秒)、开始采样前的最短等待(秒)
+SETTLE_TIMEOUT = env_float("SETTLE_TIMEOUT", 3.0)
+SETTLE_LAUNCH_TIMEOUT = env_float("SETTLE_LAUNCH_TIMEOUT", 8.0)
+SETTLE_STABLE_FRAMES = env_int("SETTLE_STABLE_FRAMES", 1)
+SETTLE_INTERVAL = env_float("SETTLE_INTERVAL", 0.05)
+SETTLE_MIN_WAIT = env_float("SETTLE_MIN_WAIT", 0.2)
+# 稳定检测使用的信号，逗号分隔 (frame/activity/hierarchy)
+SETTLE_SIGNALS = tuple(s.strip() for s in env_str("SETTLE_SIGNALS", "frame,activity").split(",") if s.strip())
+# frame 信号使用的设备端缩略图缩放比例（视频流后端直接使用最新一帧）
+SETTLE_FRAME_SCALE = env_float("SETTLE_FRAME_SCALE", 0.1)
+
+# 元素提取方式：vision=整屏 OmniParser 解析，hybrid=优先使用界面层级、只在需要时视觉解析，
+# hierarchy=只使用界面层级（不调用 OmniParser）
+EXTRACTION_MODE = env_str("EXTRACTION", "vision").lower()
+
+# 增量解析：只把相对上一次截图变化的区域交给 OmniParser
+# 网格边长(像素)、块内平均像素差阈值、变化面积超过该比例时改为整屏解析
+INCREMENTAL_PARSE = env_bool("INCREMENTAL_PARSE", False)
+INCREMENTAL_TILE_SIZE = env_int("INCREMENTAL_TILE_SIZE", 96)
+INCREMENTAL_TILE_THRESHOLD = env_float("INCREMENTAL_TILE_THRESHOLD", 4.0)
+INCREMENTAL_MAX_AREA = env_float("INCREMENTAL_MAX_AREA", 0.4)
+
+# 截图后端：screenshot=d.screenshot()，stream=持续解码 H.264 视频流（需要安装 PyAV）
+# 视频文件路径（为空时使用 adb screenrecord）、环形缓冲区帧数
+CAPTURE_BACKEND = env_str("CAPTURE_BACKEND", "screenshot").lower()
+CAPTURE_STREAM_SOURCE = env_str("CAPTURE_STREAM_SOURCE", "")
+CAPTURE_BUFFER_SIZE = env_int("CAPTURE_BUFFER_SIZE", 8)
+
+# 截图存储：目录（为空时使用系统临时目录下的 android-control-mcp），文件数、总大小(MB)、保存时间(秒)上限，
+# 0 表示不限制；关闭持久化后截图和标注图片都不写入磁盘
+CAPTURE_DIR = env_str("CAPTURE_DIR", "")
+CAPTURE_MAX_FILES = env_int("CAPTURE_MAX_FILES", 200)
+CAPTURE_MAX_MB = env_float("CAPTURE_MAX_MB", 200.0)
+CAPTURE_MAX_AGE = env_float("CAPTURE_MAX_AGE", 3600.0)
+CAPTURE_PERSIST = env_bool("CAPTURE_PERSIST", True)
+
+# 耗时统计：每个阶段/工具保留最近多少次用于计算分位数，是否在工具响应中附带本次调用的阶段耗时
+METRICS_WINDOW = env_int("METRICS_WINDOW", 1024)
+METRICS_BREAKDOWN = env_bool("METRICS_BREAKDOWN", False)
+
+# 应用目录：有效期(秒)，过期后下次查询时增量刷新；{包名: 应用名称} 格式的标签文件
+APP_CATALOG_TTL = env_float("APP_CATALOG_TTL", 300.0)
+APP_LABELS_FILE = env_str("APP_LABELS_FILE", "")
+
+# 文本输入：快速输入每次广播的最大字符数；逐字输入每次广播的字符数和间隔(秒，在设备端等待)
+INPUT_CHUNK_SIZE = env_int("INPUT_CHUNK_SIZE", 500)
+INPUT_SLOW_CHUNK_SIZE = env_int("INPUT_SLOW_CHUNK_SIZE", 1)
+INPUT_SLOW_INTERVAL = env_float("INPUT_SLOW_INTERVAL", 0.03)
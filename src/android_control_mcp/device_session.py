@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+设备会话管理
+在 server.py 和 screen_utils.py 之间共享同一个 uiautomator2 连接
+"""
+
+import asyncio
+import threading
+import adbutils
+import uiautomator2 as u2
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from PIL import Image
+from . import config
+from .app_catalog import AppCatalog
+from .capture import FrameGrabber
+from .input_engine import InputEngine
+from .lock_detector import LockDetector
+from .metrics import span
+from .parse_cache import ParseCache
+from .screen_delta import ScreenDeltaTracker
+from .screen_state import ScreenStateCache
+
+
+# 视为静态的 d.info 字段，只在旋转或显示变化时刷新
+STATIC_INFO_KEYS = (
+    "displayWidth",
+    "displayHeight",
+    "displayRotation",
+    "displaySizeDpX",
+    "displaySizeDpY",
+    "naturalOrientation",
+    "productName",
+    "sdkInt",
+)
+
+# 视为连接断开的异常，遇到时重连；只读操作重试一次
+CONNECTION_ERRORS = (
+    OSError,
+    u2.exceptions.ConnectError,
+    u2.exceptions.HTTPError,
+    u2.exceptions.UiAutomationNotConnectedError,
+)
+
+
+def not_delivered(error: Exception) -> bool:
+    """请求是否确定没有到达设备（连接未建立），此时重试不会重复执行操作"""
+    if isinstance(error, (u2.exceptions.ConnectError, ConnectionRefusedError)):
+        return True
+    # uiautomator2 在建立 adb 转发连接失败时抛出 HTTPError，原因是 AdbError
+    return isinstance(error, u2.exceptions.HTTPError) and isinstance(error.__cause__, adbutils.AdbError)
+
+
+class DeviceSession:
+    """单个设备的长连接会话，缓存静态设备属性并在断线后自动恢复"""
+
+    def __init__(self, serial: Optional[str] = None):
+        """
+        Args:
+            serial: 设备序列号或地址，为空时使用默认设备
+        """
+        self.serial = serial
+        self._device: Optional[u2.Device] = None
+        self._static_info: Dict[str, Any] = {}
+        self._device_info: Dict[str, Any] = {}
+        self._connect_lock = threading.Lock()
+        self._async_lock: Optional[asyncio.Lock] = None
+        self.lock_detector = LockDetector(unlocked_ttl=config.LOCK_CHECK_TTL)
+        self.parse_cache = ParseCache(
+            max_size=config.PARSE_CACHE_SIZE,
+            ttl=config.PARSE_CACHE_TTL,
+            threshold=config.PARSE_CACHE_THRESHOLD
+        )
+        self.screen_state = ScreenStateCache(max_age=config.SCREEN_STATE_MAX_AGE)
+        self.delta_tracker = ScreenDeltaTracker()
+        self.app_catalog = AppCatalog(ttl=config.APP_CATALOG_TTL, labels_file=config.APP_LABELS_FILE)
+        self.capture = FrameGrabber(
+            backend=config.CAPTURE_BACKEND,
+            source=config.CAPTURE_STREAM_SOURCE,
+            buffer_size=config.CAPTURE_BUFFER_SIZE,
+            sample_scale=config.SETTLE_FRAME_SCALE
+        )
+        self.input = InputEngine(
+            chunk_size=config.INPUT_CHUNK_SIZE,
+            slow_chunk_size=config.INPUT_SLOW_CHUNK_SIZE,
+            slow_interval=config.INPUT_SLOW_INTERVAL
+        )
+
+    @property
+    def device(self) -> u2.Device:
+        """获取设备对象，未连接时自动连接"""
+        if self._device is None:
+            with self._connect_lock:
+                if self._device is None:
+                    with span("connect"):
+                        self._device = u2.connect(self.serial)
+                    self._static_info = {}
+                    self._device_info = {}
+        return self._device
+
+    @property
+    def async_lock(self) -> asyncio.Lock:
+        """设备锁，串行化异步工具对该设备的访问（在事件循环中首次使用时创建）"""
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+        return self._async_lock
+
+    def attach(self, device: u2.Device):
+        """使用已经建立的连接（尚未连接时）"""
+        with self._connect_lock:
+            if self._device is None:
+                self._device = device
+                self._static_info = {}
+                self._device_info = {}
+
+    def reset(self):
+        """丢弃当前连接，下次访问时重新连接"""
+        with self._connect_lock:
+            self._device = None
+            self._static_info = {}
+            self._device_info = {}
+
+    def call(self, func: Callable[..., Any], *args, retry: bool = True, **kwargs) -> Any:
+        """
+        在设备上执行操作，连接断开时自动重连并重试一次
+
+        Args:
+            func: 以设备对象为第一个参数的函数
+            retry: 是否可以安全重试。点击、滑动、输入等操作传 False，
+                只在请求确定没有到达设备时重试，避免同一个操作执行两次
+        """
+        try:
+            return func(self.device, *args, **kwargs)
+        except CONNECTION_ERRORS as e:
+            self.reset()
+            if not retry and not not_delivered(e):
+                print(f"设备连接异常，操作可能已执行，不再重试: {e}")
+                raise
+            print(f"设备连接异常，正在重连: {e}")
+            return func(self.device, *args, **kwargs)
+
+    def act(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        执行会改变界面的操作（点击、滑动、按键、输入等）
+
+        缓存的屏幕状态不再复用（仍保留为增量解析的基准），下一次需要屏幕信息时重新截图解析；
+        操作不自动重试，除非请求确定没有到达设备
+
+        Args:
+            func: 以设备对象为第一个参数的函数
+        """
+        self.screen_state.invalidate()
+        return self.call(func, *args, retry=False, **kwargs)
+
+    def refresh_info(self) -> Dict[str, Any]:
+        """
+        读取一次 d.info，并顺带更新静态属性缓存
+
+        Returns:
+            dict: 完整的 d.info（包含 screenOn 等动态字段）
+        """
+        info = self.call(lambda d: d.info)
+        static_info = {key: info.get(key) for key in STATIC_INFO_KEYS}
+        if self._static_info and static_info != self._static_info:
+            print("检测到屏幕旋转或显示变化，已刷新设备属性缓存")
+        self._static_info = static_info
+        return info
+
+    @property
+    def static_info(self) -> Dict[str, Any]:
+        """缓存的静态设备属性"""
+        if not self._static_info:
+            self.refresh_info()
+        return dict(self._static_info)
+
+    @property
+    def device_info(self) -> Dict[str, Any]:
+        """缓存的设备硬件信息（品牌、型号、SDK、系统版本）"""
+        if not self._device_info:
+            self._device_info = self.call(lambda d: d.device_info)
+        return dict(self._device_info)
+
+    def screenshot(self) -> Image.Image:
+        """按配置的截图后端获取当前画面，视频流不可用时使用 d.screenshot()"""
+        return self.capture.grab(self)
+
+    def app_catalog_ready(self, force: bool = False) -> AppCatalog:
+        """返回应用目录，过期时通过一次 pm list packages 增量刷新"""
+        self.app_catalog.refresh(lambda args: self.call(lambda d: d.shell(args)).output, force=force)
+        return self.app_catalog
+
+    def display_size(self) -> Tuple[int, int]:
+        """缓存的屏幕尺寸 (宽, 高)"""
+        info = self.static_info
+        return info["displayWidth"], info["displayHeight"]
+
+
+class DeviceRegistry:
+    """按序列号或地址管理多个设备会话，每个设备有独立的连接、锁和缓存
+
+    不指定设备时连接默认设备并按其实际序列号注册，与显式指定该序列号共用同一个会话
+    """
+
+    def __init__(self):
+        self._sessions: Dict[str, DeviceSession] = {}
+        self._lock = threading.Lock()
+        # 默认设备的实际序列号，首次不指定设备时解析
+        self._default_serial: Optional[str] = None
+        self._default_lock = threading.Lock()
+
+    def get(self, serial: Optional[str] = None) -> DeviceSession:
+        """
+        获取设备会话，不存在时创建
+
+        Args:
+            serial: 设备序列号或地址（如 emulator-5554、10.0.0.1:5555），为空时使用默认设备
+        """
+        if not serial:
+            serial = self.default_serial()
+        session = self._sessions.get(serial)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(serial)
+                if session is None:
+                    session = DeviceSession(serial)
+                    self._sessions[serial] = session
+        return session
+
+    def default_serial(self) -> str:
+        """默认设备的实际序列号：连接一次默认设备（ANDROID_SERIAL 或唯一的 adb 设备）后缓存"""
+        if self._default_serial is None:
+            with self._default_lock:
+                if self._default_serial is None:
+                    with span("connect"):
+                        device = u2.connect()
+                    serial = device.serial
+                    # 复用刚建立的连接
+                    self.get(serial).attach(device)
+                    self._default_serial = serial
+        return self._default_serial
+
+    def remove(self, serial: Optional[str] = None):
+        """移除设备会话，为空时移除默认设备的会话并在下次重新解析默认设备"""
+        with self._lock:
+            if not serial:
+                serial, self._default_serial = self._default_serial, None
+            session = self._sessions.pop(serial, None) if serial else None
+        if session is not None:
+            # 停止视频流解码线程和 screenrecord 进程
+            session.capture.close()
+
+    def sessions(self) -> Dict[str, DeviceSession]:
+        """已创建的全部会话"""
+        return dict(self._sessions)
+
+    @staticmethod
+    def connected_serials() -> List[str]:
+        """通过 adb 列出当前已连接的设备序列号"""
+        return [d.serial for d in adbutils.adb.device_list()]
+
+
+# 进程内的设备注册表
+registry = DeviceRegistry()
+
+
+def get_session(serial: Optional[str] = None) -> DeviceSession:
+    """
+    获取设备会话
+
+    Args:
+        serial: 设备序列号或地址，为空时使用默认设备
+    """
+    return registry.get(serial)
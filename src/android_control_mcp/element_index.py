@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+屏幕元素索引
+每次解析后建立一次网格空间索引和文本索引，点击命中、区域查询和文本查找不再遍历全部元素
+"""
+
+import math
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+
+# 元素像素边界 (x1, y1, x2, y2)
+Bounds = Tuple[int, int, int, int]
+
+
+def element_bounds(element: Dict) -> Optional[Bounds]:
+    """根据 click_point 和 size 计算元素的像素边界，没有坐标时返回 None"""
+    click_point = element.get("click_point")
+    size = element.get("size")
+    if not click_point or not size or len(click_point) != 2 or len(size) != 2:
+        return None
+    cx, cy = click_point
+    w, h = size
+    half_w = w // 2
+    half_h = h // 2
+    return cx - half_w, cy - half_h, cx + half_w, cy + half_h
+
+
+def _element_texts(element: Dict) -> List[str]:
+    texts = []
+    for key in ("content", "text"):
+        value = element.get(key)
+        if value and isinstance(value, str):
+            texts.append(value)
+    return texts
+
+
+def _ngrams(text: str) -> Set[str]:
+    """单字和双字组合，中文按字切分同样适用"""
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+class ElementIndex:
+    """单个屏幕的元素空间索引和文本索引"""
+
+    def __init__(self, elements: List[Dict], cell_size: int = 120):
+        """
+        Args:
+            elements: screen_info["elements"]
+            cell_size: 网格单元边长(像素)
+        """
+        self.elements = elements
+        self.cell_size = cell_size
+        self._bounds: Dict[int, Bounds] = {}
+        self._grid: Dict[Tuple[int, int], List[int]] = {}
+        self._text: Dict[str, Set[int]] = {}
+        self._texts: Dict[int, List[str]] = {}
+        self._lower_texts: Dict[int, List[str]] = {}
+
+        for i, element in enumerate(elements):
+            bounds = element_bounds(element)
+            if bounds is not None:
+                self._bounds[i] = bounds
+                for cell in self._cells(bounds):
+                    self._grid.setdefault(cell, []).append(i)
+
+            original = _element_texts(element)
+            texts = [text.lower() for text in original]
+            if texts:
+                self._texts[i] = original
+                self._lower_texts[i] = texts
+                for text in texts:
+                    for gram in _ngrams(text):
+                        self._text.setdefault(gram, set()).add(i)
+
+        self._max_col = max((col for col, _ in self._grid), default=0)
+        self._max_row = max((row for _, row in self._grid), default=0)
+
+    def _cells(self, bounds: Bounds):
+        x1, y1, x2, y2 = bounds
+        size = self.cell_size
+        for col in range(max(x1, 0) // size, max(x2, 0) // size + 1):
+            for row in range(max(y1, 0) // size, max(y2, 0) // size + 1):
+                yield col, row
+
+    @staticmethod
+    def _area(bounds: Bounds) -> int:
+        return (bounds[2] - bounds[0]) * (bounds[3] - bounds[1])
+
+    def elements_at(self, x: int, y: int) -> List[Dict]:
+        """
+        包含该点的所有元素，按面积从小到大排列（最小的视为最上层）
+        """
+        cell = (max(x, 0) // self.cell_size, max(y, 0) // self.cell_size)
+        hits = [i for i in self._grid.get(cell, [])
+                if self._bounds[i][0] <= x <= self._bounds[i][2]
+                and self._bounds[i][1] <= y <= self._bounds[i][3]]
+        hits.sort(key=lambda i: (self._area(self._bounds[i]), -i))
+        return [self.elements[i] for i in hits]
+
+    def element_at(self, x: int, y: int) -> Optional[Dict]:
+        """包含该点的最小元素"""
+        hits = self.elements_at(x, y)
+        return hits[0] if hits else None
+
+    def elements_in_rect(self, x1: int, y1: int, x2: int, y2: int, fully_inside: bool = False) -> List[Dict]:
+        """
+        区域内的元素
+
+        Args:
+            x1, y1, x2, y2: 区域像素坐标
+            fully_inside: True 时只返回完全位于区域内的元素，否则返回与区域相交的元素
+        """
+        x1, x2 = min(x1, x2), max(x1, x2)
+        y1, y2 = min(y1, y2), max(y1, y2)
+        candidates = set()
+        for cell in self._cells((x1, y1, x2, y2)):
+            candidates.update(self._grid.get(cell, []))
+
+        matches = []
+        for i in sorted(candidates):
+            bx1, by1, bx2, by2 = self._bounds[i]
+            if fully_inside:
+                hit = x1 <= bx1 and y1 <= by1 and bx2 <= x2 and by2 <= y2
+            else:
+                hit = bx1 <= x2 and x1 <= bx2 and by1 <= y2 and y1 <= by2
+            if hit:
+                matches.append(self.elements[i])
+        return matches
+
+    def nearest_element(self,
+                        x: int,
+                        y: int,
+                        interactive_only: bool = True,
+                        max_distance: Optional[float] = None) -> Tuple[Optional[Dict], Optional[float]]:
+        """
+        离该点最近的元素（点在元素内时距离为 0）
+
+        Returns:
+            tuple: (元素, 像素距离)，找不到时为 (None, None)
+        """
+        size = self.cell_size
+        col, row = max(x, 0) // size, max(y, 0) // size
+        # 只搜索有元素的网格范围：从第一个与网格相交的环开始，到覆盖整个网格的环为止
+        first_ring = max(col - self._max_col, row - self._max_row, 0)
+        last_ring = max(col, row, self._max_col - col, self._max_row - row)
+        best, best_distance = None, math.inf
+        seen = set()
+
+        for ring in range(first_ring, last_ring + 1):
+            # 当前环之外的元素距离至少为 (ring - 1) * cell_size
+            if best is not None and (ring - 1) * size > best_distance:
+                break
+            if max_distance is not None and (ring - 1) * size > max_distance:
+                break
+            for cell in self._ring_cells(col, row, ring):
+                for i in self._grid.get(cell, []):
+                    if i in seen:
+                        continue
+                    seen.add(i)
+                    element = self.elements[i]
+                    if interactive_only and not (element.get("interactivity") or element.get("clickable")):
+                        continue
+                    bx1, by1, bx2, by2 = self._bounds[i]
+                    dx = max(bx1 - x, 0, x - bx2)
+                    dy = max(by1 - y, 0, y - by2)
+                    distance = math.hypot(dx, dy)
+                    if distance < best_distance:
+                        best, best_distance = i, distance
+
+        if best is None or (max_distance is not None and best_distance > max_distance):
+            return None, None
+        return self.elements[best], round(best_distance, 1)
+
+    def _ring_cells(self, col: int, row: int, ring: int):
+        """以 (col, row) 为中心第 ring 环上、位于网格范围内的单元（只遍历环的边）"""
+        if ring == 0:
+            yield col, row
+            return
+        left, right = max(col - ring, 0), min(col + ring, self._max_col)
+        for r in (row - ring, row + ring):
+            if 0 <= r <= self._max_row:
+                for c in range(left, right + 1):
+                    yield c, r
+        top, bottom = max(row - ring + 1, 0), min(row + ring - 1, self._max_row)
+        for c in (col - ring, col + ring):
+            if 0 <= c <= self._max_col:
+                for r in range(top, bottom + 1):
+                    yield c, r
+
+    def find_text(self, text: str, case_sensitive: bool = False) -> List[Dict]:
+        """
+        按文本查找元素（部分匹配）
+
+        Args:
+            text: 要查找的文本
+            case_sensitive: 是否区分大小写；区分时用索引筛出候选后再按原始文本比较
+        """
+        query = text.lower()
+        if not query:
+            # 空字符串包含于任何文本
+            return [self.elements[i] for i in sorted(self._texts)] if case_sensitive else []
+        candidates = None
+        for gram in _ngrams(query):
+            ids = self._text.get(gram)
+            if not ids:
+                return []
+            candidates = set(ids) if candidates is None else candidates & ids
+        if case_sensitive:
+            return [self.elements[i] for i in sorted(candidates)
+                    if any(text in t for t in self._texts[i])]
+        return [self.elements[i] for i in sorted(candidates)
+                if any(query in t for t in self._lower_texts[i])]
+
+    def interactive_elements(self) -> List[Dict]:
+        """所有可交互元素"""
+        return [e for e in self.elements if e.get("interactivity", False) or e.get("clickable", False)]
+
+
+# 最近建立的索引，按 screen_info 对象缓存，同一次解析只建立一次
+_index_cache: "OrderedDict[int, Tuple[Dict, ElementIndex]]" = OrderedDict()
+_index_cache_lock = threading.Lock()
+_INDEX_CACHE_SIZE = 8
+
+
+def get_element_index(screen_info: Dict) -> ElementIndex:
+    """获取 screen_info 对应的元素索引，不存在时建立"""
+    key = id(screen_info)
+    with _index_cache_lock:
+        cached = _index_cache.get(key)
+        # 保存 screen_info 的引用，避免对象回收后 id 被复用
+        if cached is not None and cached[0] is screen_info and cached[1].elements is screen_info["elements"]:
+            _index_cache.move_to_end(key)
+            return cached[1]
+    index = ElementIndex(screen_info["elements"])
+    with _index_cache_lock:
+        _index_cache[key] = (screen_info, index)
+        _index_cache.move_to_end(key)
+        while len(_index_cache) > _INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return index
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+界面层级元素提取
+把 d.dump_hierarchy() 的 XML 转成与 OmniParser 结果相同格式的元素，
+并找出 WebView/SurfaceView 等层级信息不可用、需要视觉解析的区域
+"""
+
+import re
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional, Tuple
+from .element_index import element_bounds
+from .screen_delta import bbox_iou
+
+
+# 层级信息通常不可用、需要视觉解析的控件类名关键字
+VISION_CLASS_KEYWORDS = ("WebView", "SurfaceView", "TextureView", "GLSurfaceView", "VideoView", "Canvas", "FlutterView", "UnityPlayer")
+
+_BOUNDS_PATTERN = re.compile(r"\[(-?\d+),(-?\d+)\]\[(-?\d+),(-?\d+)\]")
+
+# 像素区域 (x1, y1, x2, y2)
+Region = Tuple[int, int, int, int]
+
+
+def parse_bounds(bounds: str) -> Optional[Region]:
+    """解析 "[x1,y1][x2,y2]" 格式的边界，无效或面积为 0 时返回 None"""
+    match = _BOUNDS_PATTERN.match(bounds or "")
+    if not match:
+        return None
+    x1, y1, x2, y2 = (int(v) for v in match.groups())
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return x1, y1, x2, y2
+
+
+def region_element(region: Region) -> Dict:
+    """根据像素区域生成 click_point 和 size"""
+    x1, y1, x2, y2 = region
+    return {
+        "click_point": [(x1 + x2) // 2, (y1 + y2) // 2],
+        "size": [x2 - x1, y2 - y1]
+    }
+
+
+def _is_interactive(node: ET.Element) -> bool:
+    return any(node.get(attr) == "true" for attr in ("clickable", "long-clickable", "checkable", "scrollable")) \
+        or (node.get("focusable") == "true" and "EditText" in (node.get("class") or ""))
+
+
+def _node_text(node: ET.Element) -> str:
+    return (node.get("text") or node.get("content-desc") or "").strip()
+
+
+def _clip(region: Region, width: int, height: int) -> Optional[Region]:
+    x1, y1, x2, y2 = max(region[0], 0), max(region[1], 0), min(region[2], width), min(region[3], height)
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return x1, y1, x2, y2
+
+
+def extract_hierarchy_elements(hierarchy: str, width: int, height: int) -> Tuple[List[Dict], List[Region]]:
+    """
+    从层级 XML 提取元素
+
+    文本节点直接作为 text 元素（祖先可点击时视为可交互）；
+    没有任何文本后代的可交互节点作为 icon 元素，内容取 content-desc 或 resource-id。
+
+    Args:
+        hierarchy: d.dump_hierarchy() 返回的 XML
+        width: 屏幕宽度
+        height: 屏幕高度
+
+    Returns:
+        tuple: (元素列表, 需要视觉解析的像素区域列表)
+    """
+    root = ET.fromstring(hierarchy)
+    elements: List[Dict] = []
+    vision_regions: List[Region] = []
+
+    def walk(node: ET.Element, clickable_ancestor: bool) -> bool:
+        """返回子树中是否有文本"""
+        if node.get("visible-to-user") == "false":
+            return False
+        region = parse_bounds(node.get("bounds"))
+        if region is not None:
+            region = _clip(region, width, height)
+        interactive = _is_interactive(node)
+
+        has_text = False
+        for child in node:
+            if walk(child, clickable_ancestor or interactive):
+                has_text = True
+
+        if region is None:
+            return has_text
+
+        class_name = node.get("class") or ""
+        if any(keyword in class_name for keyword in VISION_CLASS_KEYWORDS) and not has_text:
+            # 内容没有暴露给无障碍服务的区域，需要视觉解析
+            vision_regions.append(region)
+            return False
+
+        text = _node_text(node)
+        if text and node.get("text"):
+            element = {
+                "type": "text",
+                "content": text,
+                "interactivity": interactive or clickable_ancestor
+            }
+        elif (text or interactive) and not has_text:
+            element = {
+                "type": "icon",
+                "content": text or (node.get("resource-id") or "").split("/")[-1] or None,
+                "interactivity": interactive or clickable_ancestor
+            }
+        else:
+            element = None
+
+        if element is not None:
+            element.update(region_element(region))
+            element["resource_id"] = node.get("resource-id") or None
+            element["source"] = "hierarchy"
+            elements.append(element)
+            has_text = has_text or bool(text)
+
+        return has_text
+
+    for child in root:
+        walk(child, False)
+
+    # 按从上到下、从左到右排列，与视觉解析的顺序接近
+    elements.sort(key=lambda e: (e["click_point"][1] - e["size"][1] // 2, e["click_point"][0]))
+    return elements, vision_regions
+
+
+def plan_extraction(elements: List[Dict],
+                    vision_regions: List[Region],
+                    width: int,
+                    height: int,
+                    min_elements: int = 3,
+                    max_vision_ratio: float = 0.5) -> str:
+    """
+    决定当前屏幕的解析方式
+
+    Returns:
+        str: hierarchy=只用层级, regions=层级 + 局部视觉解析, vision=整屏视觉解析
+    """
+    if len(elements) < min_elements:
+        return "vision"
+    if not vision_regions:
+        return "hierarchy"
+    vision_area = sum((r[2] - r[0]) * (r[3] - r[1]) for r in vision_regions)
+    if vision_area > width * height * max_vision_ratio:
+        return "vision"
+    return "regions"
+
+
+def merge_elements(primary: List[Dict], secondary: List[Dict], iou_threshold: float = 0.5) -> List[Dict]:
+    """
+    合并两个来源的元素，去掉 secondary 中与 primary 重复的元素
+
+    与 primary 中某个元素重叠度达到阈值，或文本相同且中心点落在其范围内，视为重复
+
+    Args:
+        primary: 优先保留的元素（通常来自层级）
+        secondary: 补充的元素（通常来自视觉解析）
+        iou_threshold: 判定重复的重叠度
+
+    Returns:
+        list: 合并后的元素列表
+    """
+    primary_bounds = [(element_bounds(e), e.get("content")) for e in primary]
+    merged = list(primary)
+    for element in secondary:
+        bounds = element_bounds(element)
+        duplicate = False
+        if bounds is not None:
+            cx, cy = element["click_point"]
+            for other, content in primary_bounds:
+                if other is None:
+                    continue
+                if bbox_iou(bounds, other) >= iou_threshold:
+                    duplicate = True
+                elif content and content == element.get("content") \
+                        and other[0] <= cx <= other[2] and other[1] <= cy <= other[3]:
+                    duplicate = True
+                if duplicate:
+                    break
+        if not duplicate:
+            merged.append(element)
+    return merged
+
+
+def find_nodes(hierarchy: str,
+               width: int,
+               height: int,
+               text: Optional[str] = None,
+               resource_id: Optional[str] = None,
+               content: Optional[str] = None,
+               exact: bool = False) -> List[Dict]:
+    """
+    在层级中查找屏幕内可见的目标节点，指定的条件需要全部满足
+
+    Args:
+        hierarchy: d.dump_hierarchy() 返回的 XML
+        width: 屏幕宽度
+        height: 屏幕高度
+        text: 匹配 text 或 content-desc，exact 为 False 时不区分大小写包含匹配
+        resource_id: 完整的 resource-id，或 "/" 之后的 id 名称
+        content: 在 text、content-desc、resource-id 中不区分大小写包含匹配
+        exact: text 是否要求完全相等
+
+    Returns:
+        list: 与层级提取相同格式的元素，按文档顺序排列
+    """
+    root = ET.fromstring(hierarchy)
+    matches = []
+    for node in root.iter("node"):
+        if node.get("visible-to-user") == "false":
+            continue
+        values = [(node.get("text") or "").strip(), (node.get("content-desc") or "").strip()]
+        node_id = node.get("resource-id") or ""
+        if text is not None:
+            if exact:
+                if text not in values:
+                    continue
+            elif not any(text.lower() in value.lower() for value in values if value):
+                continue
+        if resource_id is not None and resource_id not in (node_id, node_id.split("/")[-1]):
+            continue
+        if content is not None and content.lower() not in " ".join(values + [node_id]).lower():
+            continue
+        region = parse_bounds(node.get("bounds"))
+        if region is not None:
+            region = _clip(region, width, height)
+        if region is None:
+            continue
+        label = _node_text(node)
+        element = {
+            "type": "text" if label else "icon",
+            "content": label or node_id.split("/")[-1] or None,
+            "interactivity": _is_interactive(node)
+        }
+        element.update(region_element(region))
+        element["resource_id"] = node_id or None
+        element["source"] = "hierarchy"
+        matches.append(element)
+    return matches
+
+
+def hierarchy_signature(hierarchy: str) -> Tuple[Tuple[str, str], ...]:
+    """带文本或 resource-id 的节点及其边界，内容没有滚动时保持不变"""
+    root = ET.fromstring(hierarchy)
+    return tuple(
+        (_node_text(node) or node.get("resource-id") or "", node.get("bounds") or "")
+        for node in root.iter("node")
+        if _node_text(node) or node.get("resource-id")
+    )
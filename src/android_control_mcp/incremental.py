@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+增量解析
+按网格比较新旧截图，只找出发生变化的区域，未变化区域的元素沿用上一次的解析结果
+"""
+
+from typing import Dict, List, Optional, Tuple
+from PIL import Image, ImageChops
+from .element_index import element_bounds
+
+
+# 像素区域 (x1, y1, x2, y2)
+Region = Tuple[int, int, int, int]
+
+
+def changed_tiles(previous: Image.Image,
+                  current: Image.Image,
+                  tile_size: int = 96,
+                  threshold: float = 4.0) -> List[Tuple[int, int]]:
+    """
+    逐块比较两张截图
+
+    Args:
+        previous: 上一次截图
+        current: 当前截图，尺寸必须一致
+        tile_size: 网格边长(像素)
+        threshold: 块内平均像素差 (0-255) 超过该值视为变化
+
+    Returns:
+        list: 变化的块坐标 (列, 行)
+    """
+    diff = ImageChops.difference(previous.convert("L"), current.convert("L"))
+    cols = -(-diff.width // tile_size)
+    rows = -(-diff.height // tile_size)
+    # BOX 缩放后每个像素就是对应块的平均差值
+    means = diff.resize((cols, rows), Image.BOX).load()
+    return [(col, row) for row in range(rows) for col in range(cols) if means[col, row] > threshold]
+
+
+def tiles_to_regions(tiles: List[Tuple[int, int]], tile_size: int, width: int, height: int) -> List[Region]:
+    """把相邻的变化块合并成若干个矩形区域"""
+    remaining = set(tiles)
+    regions = []
+    while remaining:
+        start = remaining.pop()
+        stack = [start]
+        min_col, min_row, max_col, max_row = start[0], start[1], start[0], start[1]
+        while stack:
+            col, row = stack.pop()
+            min_col, max_col = min(min_col, col), max(max_col, col)
+            min_row, max_row = min(min_row, row), max(max_row, row)
+            for neighbor in ((col + 1, row), (col - 1, row), (col, row + 1), (col, row - 1)):
+                if neighbor in remaining:
+                    remaining.remove(neighbor)
+                    stack.append(neighbor)
+        regions.append((min_col * tile_size, min_row * tile_size,
+                        min((max_col + 1) * tile_size, width), min((max_row + 1) * tile_size, height)))
+    return merge_overlapping(regions)
+
+
+def _intersects(a: Region, b: Region) -> bool:
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def merge_overlapping(regions: List[Region]) -> List[Region]:
+    """合并相交的区域，直到互不相交"""
+    regions = list(regions)
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(regions)):
+            for j in range(i + 1, len(regions)):
+                if _intersects(regions[i], regions[j]):
+                    a, b = regions[i], regions.pop(j)
+                    regions[i] = (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+                    merged = True
+                    break
+            if merged:
+                break
+    return regions
+
+
+def expand_regions(regions: List[Region], elements: List[Dict], width: int, height: int) -> List[Region]:
+    """
+    把区域扩展到完整包含与其相交的旧元素，避免元素被裁成两半
+    """
+    expanded = []
+    for region in regions:
+        x1, y1, x2, y2 = region
+        for element in elements:
+            bounds = element_bounds(element)
+            if bounds is not None and _intersects(region, bounds):
+                x1, y1 = min(x1, bounds[0]), min(y1, bounds[1])
+                x2, y2 = max(x2, bounds[2]), max(y2, bounds[3])
+        expanded.append((max(x1, 0), max(y1, 0), min(x2, width), min(y2, height)))
+    return merge_overlapping(expanded)
+
+
+def plan_incremental(previous: Image.Image,
+                     current: Image.Image,
+                     elements: List[Dict],
+                     tile_size: int = 96,
+                     threshold: float = 4.0,
+                     max_ratio: float = 0.4) -> Optional[Tuple[List[Region], List[Dict]]]:
+    """
+    计算需要重新解析的区域和可以沿用的旧元素
+
+    Args:
+        previous: 上一次解析时的截图
+        current: 当前截图
+        elements: 上一次解析得到的元素
+        tile_size: 网格边长(像素)
+        threshold: 块内平均像素差阈值
+        max_ratio: 变化面积占整屏的最大比例，超过时返回 None
+
+    Returns:
+        tuple: (需要解析的区域, 沿用的元素)，不适合增量解析时返回 None
+    """
+    if previous.size != current.size:
+        return None
+    width, height = current.size
+    tiles = changed_tiles(previous, current, tile_size, threshold)
+    regions = expand_regions(tiles_to_regions(tiles, tile_size, width, height), elements, width, height)
+
+    area = sum((r[2] - r[0]) * (r[3] - r[1]) for r in regions)
+    if area > width * height * max_ratio:
+        return None
+
+    kept = []
+    for element in elements:
+        bounds = element_bounds(element)
+        if bounds is not None and any(_intersects(region, bounds) for region in regions):
+            continue
+        # 去掉上一次响应写入的 id 和序号，由本次响应重新分配（标注图片按序号绘制）
+        kept.append({k: v for k, v in element.items() if k not in ("id", "index")})
+    return regions, kept
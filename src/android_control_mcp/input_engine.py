@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+文本输入
+输入法在会话内只切换一次并保持启用；清空、分块输入、隐藏键盘合并为一条 shell 命令，
+逐字输入的打字间隔在设备端执行；输入后只读取焦点输入框的文本做校验
+"""
+
+import base64
+import threading
+from typing import Any, Dict, List, Optional
+from .metrics import span
+
+
+# uiautomator2 自带的输入法广播
+INPUT_ACTION = "ADB_KEYBOARD_INPUT_TEXT"
+CLEAR_ACTION = "ADB_KEYBOARD_CLEAR_TEXT"
+HIDE_ACTION = "ADB_KEYBOARD_HIDE"
+
+# 广播成功时 am 输出 result=-1
+BROADCAST_OK = "result=-1"
+
+
+def broadcast_command(action: str, text: Optional[str] = None) -> str:
+    """am broadcast 命令，文本按 UTF-8 + base64 编码（只含 shell 安全字符）"""
+    command = f"am broadcast -a {action}"
+    if text is not None:
+        command += " --es text " + base64.b64encode(text.encode("utf-8")).decode()
+    return command
+
+
+def split_text(text: str, size: int) -> List[str]:
+    """按字符数切分文本，size <= 0 时不切分"""
+    if size <= 0 or len(text) <= size:
+        return [text] if text else []
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class InputEngine:
+    """单个设备会话的文本输入"""
+
+    def __init__(self,
+                 chunk_size: int = 500,
+                 slow_chunk_size: int = 1,
+                 slow_interval: float = 0.03,
+                 max_command: int = 4000):
+        """
+        Args:
+            chunk_size: 快速输入时每次广播的最大字符数
+            slow_chunk_size: 逐字输入时每次广播的字符数
+            slow_interval: 逐字输入时两次广播之间的间隔(秒)，在设备端 sleep
+            max_command: 单条 shell 命令的最大长度，超出时拆成多次调用
+        """
+        self.chunk_size = chunk_size
+        self.slow_chunk_size = slow_chunk_size
+        self.slow_interval = slow_interval
+        self.max_command = max_command
+        # 已经启用输入法的设备对象，重连后需要重新启用
+        self._ime_device: Any = None
+        self._lock = threading.Lock()
+
+    def ensure_ime(self, session, force: bool = False):
+        """启用 uiautomator2 输入法，同一个连接只执行一次"""
+        with self._lock:
+            if not force and self._ime_device is session.device:
+                return
+            with span("input.ime"):
+                session.call(lambda d: d.set_input_ime(True))
+            self._ime_device = session.device
+
+    def plan(self, text: str, clear: bool = False, slowly: bool = False) -> List[str]:
+        """
+        生成 shell 命令，每条命令包含若干个广播
+
+        Returns:
+            list: shell 命令，通常只有一条
+        """
+        parts = [broadcast_command(CLEAR_ACTION)] if clear else []
+        chunks = split_text(text, self.slow_chunk_size if slowly else self.chunk_size)
+        for i, chunk in enumerate(chunks):
+            if slowly and i > 0 and self.slow_interval > 0:
+                parts.append(f"sleep {self.slow_interval:g}")
+            parts.append(broadcast_command(INPUT_ACTION, chunk))
+        if parts:
+            parts.append(broadcast_command(HIDE_ACTION))
+
+        commands, current = [], []
+        for part in parts:
+            if current and len("; ".join(current + [part])) > self.max_command:
+                commands.append("; ".join(current))
+                current = []
+            current.append(part)
+        if current:
+            commands.append("; ".join(current))
+        return commands
+
+    def _run(self, session, commands: List[str]) -> Optional[int]:
+        """
+        执行命令
+
+        Returns:
+            int: 全部广播成功时返回 None，否则返回成功的广播数
+        """
+        succeeded = 0
+        for command in commands:
+            with span("input.broadcast"):
+                output = session.act(lambda d: d.shell(command)).output
+            ok = output.count(BROADCAST_OK)
+            succeeded += ok
+            if ok < command.count("am broadcast"):
+                return succeeded
+        return None
+
+    def type(self, session, text: str, clear: bool = False, slowly: bool = False) -> Dict[str, Any]:
+        """
+        在当前焦点输入文本
+
+        Args:
+            session: 设备会话
+            text: 要输入的文本
+            clear: 输入前是否清空（与输入在同一条命令中完成）
+            slowly: 是否按打字节奏分块输入
+
+        Returns:
+            dict: {"commands": shell 调用次数, "method": broadcast 或 set_text}
+        """
+        commands = self.plan(text, clear, slowly)
+        if not commands:
+            return {"commands": 0, "method": "broadcast"}
+
+        self.ensure_ime(session)
+        succeeded = self._run(session, commands)
+        if succeeded is None:
+            return {"commands": len(commands), "method": "broadcast"}
+        if succeeded > 0:
+            # 部分文本已经输入，重试会重复输入
+            raise RuntimeError("Text input interrupted: input method broadcast failed")
+
+        # 输入法可能被用户或系统切换：重新启用后再试一次
+        print("输入法广播失败，重新启用输入法后重试")
+        self.ensure_ime(session, force=True)
+        if self._run(session, commands) is None:
+            return {"commands": 2 * len(commands), "method": "broadcast"}
+
+        # 与 uiautomator2 相同的兜底：直接设置焦点输入框的文本
+        print("输入法不可用，改为设置焦点输入框文本")
+        with span("input.set_text"):
+            current = "" if clear else (self.focused_text(session) or "")
+            session.act(lambda d: d(focused=True).set_text(current + text))
+        return {"commands": 2 * len(commands), "method": "set_text"}
+
+    @staticmethod
+    def focused_text(session) -> Optional[str]:
+        """焦点输入框的文本（一次 RPC），没有焦点输入框时返回 None"""
+        try:
+            with span("input.verify"):
+                return session.call(lambda d: d(focused=True).get_text())
+        except Exception:
+            return None
+
+    def verify(self, session, text: str, clear: bool = False) -> Dict[str, Any]:
+        """
+        读取焦点输入框确认文本已输入，代替完整的截图解析
+
+        Returns:
+            dict: {"focused_text": 焦点输入框文本, "verified": 是否包含输入的文本}
+        """
+        focused = self.focused_text(session)
+        if focused is None:
+            verified = None
+        elif clear:
+            verified = focused == text
+        else:
+            verified = text in focused
+        return {"focused_text": focused, "verified": verified}
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+锁屏检测
+一次 dump_hierarchy 后在本地解析，避免逐个 TextView 读取 info
+"""
+
+import time
+import xml.etree.ElementTree as ET
+import uiautomator2 as u2
+from typing import Dict, Optional
+
+
+# 锁屏特征文本
+LOCK_KEYWORDS = ["仅限紧急呼叫", "滑动解锁", "向上滑动解锁", "Emergency calls only"]
+
+# 锁屏时的前台包名
+LOCK_PACKAGES = ["com.android.systemui", "com.miui.aod", "com.android.keyguard"]
+
+
+def find_lock_text(hierarchy: str) -> Optional[str]:
+    """
+    在层级 XML 中一次遍历查找锁屏关键词
+
+    Args:
+        hierarchy: d.dump_hierarchy() 返回的 XML
+
+    Returns:
+        str: 命中的文本，没有命中时返回 None
+    """
+    try:
+        root = ET.fromstring(hierarchy)
+    except ET.ParseError:
+        return None
+    for node in root.iter("node"):
+        text = node.get("text") or node.get("content-desc")
+        if text and any(keyword in text for keyword in LOCK_KEYWORDS):
+            return text
+    return None
+
+
+class LockDetector:
+    """锁屏检测器，前台包名近期确认未锁屏时直接跳过检测"""
+
+    def __init__(self, unlocked_ttl: float = 3.0):
+        """
+        Args:
+            unlocked_ttl: 包名确认未锁屏后免检的时间窗口(秒)，0 表示每次都检测
+        """
+        self.unlocked_ttl = unlocked_ttl
+        self._unlocked_at: Dict[str, float] = {}
+
+    def is_locked(self,
+                  d: u2.Device,
+                  package: str,
+                  hierarchy: Optional[str] = None,
+                  use_cache: bool = True) -> bool:
+        """
+        判断当前是否处于锁屏界面
+
+        Args:
+            d: uiautomator2 设备对象
+            package: 当前前台包名
+            hierarchy: 已获取的层级 XML，为空时调用一次 dump_hierarchy
+            use_cache: 是否使用免检窗口
+
+        Returns:
+            bool: 是否锁屏
+        """
+        if package in LOCK_PACKAGES:
+            print("检测到系统UI包，判定为锁屏")
+            self._unlocked_at.pop(package, None)
+            return True
+
+        if use_cache and self._recently_unlocked(package):
+            return False
+
+        if hierarchy is None:
+            try:
+                hierarchy = d.dump_hierarchy()
+            except Exception as e:
+                print(f"获取界面层级失败: {e}")
+                return False
+
+        text = find_lock_text(hierarchy)
+        if text is not None:
+            print(f"检测到锁屏关键词: {text}")
+            self._unlocked_at.pop(package, None)
+            return True
+
+        self._unlocked_at[package] = time.monotonic()
+        return False
+
+    def invalidate(self):
+        """清空免检记录，下次强制检测"""
+        self._unlocked_at.clear()
+
+    def _recently_unlocked(self, package: str) -> bool:
+        seen_at = self._unlocked_at.get(package)
+        return seen_at is not None and time.monotonic() - seen_at < self.unlocked_ttl
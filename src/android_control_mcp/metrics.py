@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+耗时统计
+按阶段（截图、锁屏检测、OmniParser 请求等）和按工具记录耗时，
+保留最近若干次的滚动窗口并计算 p50/p95/p99，可导出为 Prometheus 文本格式
+"""
+
+import collections
+import contextlib
+import functools
+import threading
+import time
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple
+from . import config
+
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """最近 window 次耗时的滚动窗口，另外累计全部次数和总耗时"""
+
+    def __init__(self, window: int = 1024):
+        self._samples: Deque[float] = collections.deque(maxlen=max(window, 1))
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float):
+        self._samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def ordered(self) -> List[float]:
+        """窗口内的耗时，从小到大排列"""
+        return sorted(self._samples)
+
+    def quantile(self, q: float, ordered: Optional[List[float]] = None) -> float:
+        """窗口内的分位数(秒)，按最近邻取值"""
+        ordered = ordered if ordered is not None else self.ordered()
+        if not ordered:
+            return 0.0
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    def summary(self, ordered: Optional[List[float]] = None) -> Dict[str, float]:
+        """窗口统计，单位毫秒"""
+        ordered = ordered if ordered is not None else self.ordered()
+        summary = {"count": self.count}
+        for q in QUANTILES:
+            summary[f"p{int(q * 100)}"] = round(self.quantile(q, ordered) * 1000, 1)
+        summary["mean"] = round(sum(ordered) / len(ordered) * 1000, 1) if ordered else 0.0
+        summary["max"] = round(ordered[-1] * 1000, 1) if ordered else 0.0
+        return summary
+
+
+class Metrics:
+    """进程内的阶段耗时和工具耗时统计"""
+
+    def __init__(self, window: int = 1024):
+        self.window = window
+        self._histograms: Dict[Tuple[str, str], Histogram] = {}
+        self._lock = threading.Lock()
+        # 当前线程正在执行的工具调用的阶段明细
+        self._local = threading.local()
+
+    def observe(self, kind: str, name: str, seconds: float):
+        """
+        记录一次耗时
+
+        Args:
+            kind: stage 或 tool
+            name: 阶段名或工具名
+            seconds: 耗时(秒)
+        """
+        with self._lock:
+            histogram = self._histograms.get((kind, name))
+            if histogram is None:
+                histogram = self._histograms[(kind, name)] = Histogram(self.window)
+            histogram.observe(seconds)
+        trace = getattr(self._local, "trace", None)
+        if kind == "stage" and trace is not None:
+            trace[name] = trace.get(name, 0.0) + seconds
+
+    @contextlib.contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """统计一个阶段的耗时"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("stage", name, time.perf_counter() - started)
+
+    def timed(self, name: str) -> Callable:
+        """把整个函数作为一个阶段统计耗时的装饰器"""
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    @contextlib.contextmanager
+    def trace(self) -> Iterator[Dict[str, float]]:
+        """收集当前线程内各阶段的耗时明细(秒)"""
+        previous = getattr(self._local, "trace", None)
+        self._local.trace = {}
+        try:
+            yield self._local.trace
+        finally:
+            self._local.trace = previous
+
+    def _items(self) -> List[Tuple[Tuple[str, str], Histogram, List[float]]]:
+        """在锁内复制窗口数据，避免与记录线程冲突"""
+        with self._lock:
+            return [(key, histogram, histogram.ordered()) for key, histogram in sorted(self._histograms.items())]
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """各阶段和各工具的统计，单位毫秒"""
+        snapshot: Dict[str, Dict[str, Dict[str, float]]] = {"stages": {}, "tools": {}}
+        for (kind, name), histogram, ordered in self._items():
+            snapshot[f"{kind}s"][name] = histogram.summary(ordered)
+        return snapshot
+
+    def prometheus(self) -> str:
+        """Prometheus 文本格式（summary 类型，单位秒）"""
+        items = self._items()
+        lines = []
+        for kind in ("stage", "tool"):
+            metric = f"android_mcp_{kind}_duration_seconds"
+            lines.append(f"# HELP {metric} Duration of each {kind} over the last {self.window} calls")
+            lines.append(f"# TYPE {metric} summary")
+            for (item_kind, name), histogram, ordered in items:
+                if item_kind != kind:
+                    continue
+                for q in QUANTILES:
+                    lines.append(f'{metric}{{{kind}="{name}",quantile="{q}"}} {histogram.quantile(q, ordered):.6f}')
+                lines.append(f'{metric}_sum{{{kind}="{name}"}} {histogram.total:.6f}')
+                lines.append(f'{metric}_count{{{kind}="{name}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        """清空全部统计"""
+        with self._lock:
+            self._histograms.clear()
+
+
+# 进程内共享的统计
+metrics = Metrics(window=config.METRICS_WINDOW)
+
+
+def span(name: str):
+    """统计一个阶段的耗时：with span("screenshot"): ..."""
+    return metrics.span(name)
+
+
+def timed(name: str) -> Callable:
+    """把整个函数作为一个阶段统计耗时"""
+    return metrics.timed(name)
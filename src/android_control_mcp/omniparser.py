@@ -4,42 +4,116 @@ OmniParser SDK - 简单的 Python 客户端
 
 import requests
 import json
-from typing import Dict, Optional, Union
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Union
 from pathlib import Path
+from requests.adapters import HTTPAdapter
 import base64
+from . import config
+from .circuit_breaker import CircuitBreaker
+from .metrics import span
+
+
+class ParserUnavailableError(Exception):
+    """OmniParser 不可用：连接失败、超时、服务端错误，或熔断期间未发送请求"""
 
 
 class OmniParser:
-    """OmniParser API 客户端"""
+    """OmniParser API 客户端（keep-alive 连接池，后台跟踪服务健康状态）"""
     
-    def __init__(self, api_url: str = "http://localhost:8000"):
+    def __init__(self,
+                 api_url: str = "http://localhost:8000",
+                 connect_timeout: float = 3.0,
+                 read_timeout: float = 30.0,
+                 pool_size: int = 4,
+                 health_interval: float = 30.0,
+                 batch_endpoint: str = "/parse_batch",
+                 breaker_threshold: int = 3,
+                 breaker_reset: float = 30.0):
         """
         初始化客户端
         
         Args:
             api_url: API 服务地址
+            connect_timeout: 建立连接超时(秒)
+            read_timeout: 等待响应超时(秒)
+            pool_size: 连接池大小
+            health_interval: 后台健康检查间隔(秒)，0 表示不启动后台检查
+            batch_endpoint: 一次上传多张图片的批量接口路径，为空表示只使用单张接口
+            breaker_threshold: 连续失败多少次后熔断，熔断期间请求立即失败，0 表示不熔断
+            breaker_reset: 熔断后多久(秒)放行一个试探请求
         """
         self.api_url = api_url.rstrip('/')
-        self._check_health()
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.pool_size = pool_size
+        self.batch_endpoint = batch_endpoint
+        # None 表示尚未确认服务端是否支持批量接口
+        self.batch_supported: Optional[bool] = None if batch_endpoint else False
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_reset)
+        # 不支持批量接口时并发发送单张请求的线程池，按需创建
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        
+        # 长连接会话，复用 TCP 连接
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        
+        # None 表示尚未确认
+        self.healthy: Optional[bool] = None
+        self._stop_event = threading.Event()
+        self._health_thread = None
+        if health_interval > 0:
+            self._health_thread = threading.Thread(
+                target=self._health_loop,
+                args=(health_interval,),
+                name="omniparser-health",
+                daemon=True
+            )
+            self._health_thread.start()
     
-    def _check_health(self):
+    def _check_health(self) -> bool:
         """检查服务是否可用"""
         try:
-            resp = requests.get(f"{self.api_url}/", timeout=5)
-            if resp.status_code != 200:
+            resp = self._session.get(f"{self.api_url}/", timeout=(self.connect_timeout, 5))
+            healthy = resp.status_code == 200
+            if not healthy:
                 print(f"Warning: API service may not be running properly")
-        except:
+        except requests.exceptions.RequestException:
+            healthy = False
             print(f"Warning: Cannot connect to API at {self.api_url}")
+            # 服务不可达时直接熔断，后续请求不必先等待超时
+            self.breaker.trip()
+        self.healthy = healthy
+        return healthy
+    
+    def _health_loop(self, interval: float):
+        """后台定期检查服务状态"""
+        while not self._stop_event.is_set():
+            self._check_health()
+            self._stop_event.wait(interval)
+    
+    def close(self):
+        """停止后台检查并关闭连接池"""
+        self._stop_event.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self._session.close()
     
     def parse(self, 
               image: Union[str, bytes, Path], 
-              return_labeled: bool = False) -> Dict:
+              return_labeled: bool = False,
+              image_format: str = "png") -> Dict:
         """
         解析图片中的 UI 元素
         
         Args:
             image: 图片路径或二进制数据
             return_labeled: 是否返回标注图片
+            image_format: 二进制数据的编码格式 (png/jpeg/webp)
             
         Returns:
             {
@@ -49,46 +123,117 @@ class OmniParser:
                 "labeled_image": "base64..."  # 标注图片 (可选)
             }
         """
-        # 准备文件
+        return self._make_request({'file': self._file_field(image, image_format)}, return_labeled)
+    
+    def parse_many(self,
+                   images: Sequence[Union[str, bytes, Path]],
+                   return_labeled: bool = False,
+                   image_format: str = "png") -> List[Dict]:
+        """
+        一次解析多张图片，服务端可以合并推理
+        
+        优先把全部图片放进一个 multipart 请求发送到批量接口；服务端不支持时（404/405/501）
+        记住这一点，之后改为通过连接池并发发送单张请求
+        
+        Args:
+            images: 图片路径或二进制数据
+            return_labeled: 是否返回标注图片
+            image_format: 二进制数据的编码格式 (png/jpeg/webp)
+            
+        Returns:
+            list: 与 images 顺序一致的解析结果，格式同 parse()
+        """
+        if not images:
+            return []
+        if len(images) == 1:
+            return [self.parse(images[0], return_labeled, image_format)]
+        
+        if self.batch_supported is not False:
+            files = [('files', self._file_field(image, image_format)) for image in images]
+            results = self._make_request(files, return_labeled, endpoint=self.batch_endpoint)
+            if results is not None:
+                if len(results) != len(images):
+                    raise Exception(f"API error: expected {len(images)} results, got {len(results)}")
+                return results
+        
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="omniparser")
+        futures = [self._executor.submit(self.parse, image, return_labeled, image_format) for image in images]
+        return [future.result() for future in futures]
+    
+    @staticmethod
+    def _file_field(image: Union[str, bytes, Path], image_format: str):
+        """multipart 文件字段 (文件名, 内容, MIME 类型)"""
         if isinstance(image, (str, Path)):
             with open(image, 'rb') as f:
-                files = {'file': (Path(image).name, f, 'image/png')}
-                return self._make_request(files, return_labeled)
-        else:
-            files = {'file': ('image.png', image, 'image/png')}
-            return self._make_request(files, return_labeled)
+                return Path(image).name, f.read(), 'image/png'
+        extension = "jpg" if image_format == "jpeg" else image_format
+        mime_type = "image/jpeg" if extension == "jpg" else f"image/{extension}"
+        return f'image.{extension}', image, mime_type
     
-    def _make_request(self, files: Dict, return_labeled: bool) -> Dict:
-        """发送请求"""
+    @staticmethod
+    def _simplify(result: Dict) -> Dict:
+        """简化返回格式"""
+        return {
+            "elements": result.get("elements", []),
+            "total": result.get("total_elements", 0),
+            "types": result.get("element_types", {}),
+            "labeled_image": result.get("labeled_image", None)
+        }
+    
+    def _make_request(self, files, return_labeled: bool, endpoint: str = "/parse"):
+        """
+        发送请求
+        
+        Returns:
+            单张接口返回一个结果；批量接口返回结果列表，服务端不支持批量接口时返回 None
+        """
         params = {'return_labeled_image': 'true'} if return_labeled else {}
+        batch = endpoint != "/parse"
+        
+        if not self.breaker.allow():
+            raise ParserUnavailableError(f"OmniParser unavailable (circuit open), retry in up to {self.breaker.reset_timeout:g}s")
         
         try:
-            resp = requests.post(
-                f"{self.api_url}/parse",
-                files=files,
-                params=params,
-                timeout=30
-            )
+            with span("omniparser.batch_request" if batch else "omniparser.request"):
+                resp = self._session.post(
+                    f"{self.api_url}{endpoint}",
+                    files=files,
+                    params=params,
+                    timeout=(self.connect_timeout, self.read_timeout)
+                )
             
+            if batch and resp.status_code in (404, 405, 501):
+                self.breaker.record_success()
+                print(f"OmniParser 不支持批量接口 {endpoint}，改为并发单张请求")
+                self.batch_supported = False
+                return None
+            if resp.status_code >= 500:
+                self.breaker.record_failure()
+                raise ParserUnavailableError(f"API error: {resp.status_code} - {resp.text}")
+            self.breaker.record_success()
             if resp.status_code == 200:
-                result = resp.json()
-                # 简化返回格式
-                return {
-                    "elements": result.get("elements", []),
-                    "total": result.get("total_elements", 0),
-                    "types": result.get("element_types", {}),
-                    "labeled_image": result.get("labeled_image", None)
-                }
+                self.healthy = True
+                with span("omniparser.decode"):
+                    result = resp.json()
+                if batch:
+                    self.batch_supported = True
+                    return [self._simplify(item) for item in result.get("results", [])]
+                return self._simplify(result)
             else:
                 raise Exception(f"API error: {resp.status_code} - {resp.text}")
                 
         except requests.exceptions.RequestException as e:
-            raise Exception(f"Request failed: {e}")
+            self.healthy = False
+            self.breaker.record_failure()
+            raise ParserUnavailableError(f"Request failed: {e}")
     
     def save_labeled_image(self, result: Dict, output_path: str):
         """保存标注图片"""
         if result.get("labeled_image"):
-            image_data = base64.b64decode(result["labeled_image"])
+            with span("omniparser.base64_decode"):
+                image_data = base64.b64decode(result["labeled_image"])
             with open(output_path, 'wb') as f:
                 f.write(image_data)
             print(f"Labeled image saved to: {output_path}")
@@ -96,8 +241,35 @@ class OmniParser:
             print("No labeled image in result")
 
 
+# 进程内共享的客户端
+_default_parser: Optional[OmniParser] = None
+_default_parser_lock = threading.Lock()
+
+
+def get_parser() -> OmniParser:
+    """获取进程内共享的 OmniParser 客户端，按配置创建一次"""
+    global _default_parser
+    if _default_parser is None:
+        with _default_parser_lock:
+            if _default_parser is None:
+                _default_parser = OmniParser(
+                    api_url=config.OMNIPARSER_URL,
+                    connect_timeout=config.OMNIPARSER_CONNECT_TIMEOUT,
+                    read_timeout=config.OMNIPARSER_READ_TIMEOUT,
+                    pool_size=config.OMNIPARSER_POOL_SIZE,
+                    health_interval=config.OMNIPARSER_HEALTH_INTERVAL,
+                    batch_endpoint=config.OMNIPARSER_BATCH_ENDPOINT,
+                    breaker_threshold=config.OMNIPARSER_BREAKER_THRESHOLD,
+                    breaker_reset=config.OMNIPARSER_BREAKER_RESET
+                )
+    return _default_parser
+
+
 # 便捷函数
 def parse_image(image_path: str, api_url: str = "http://localhost:8000") -> Dict:
     """快速解析图片"""
-    parser = OmniParser(api_url)
-    return parser.parse(image_path)
\ No newline at end of file
+    parser = OmniParser(api_url, health_interval=0)
+    try:
+        return parser.parse(image_path)
+    finally:
+        parser.close()
\ No newline at end of file
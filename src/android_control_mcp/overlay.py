@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+本地绘制标注图片
+根据解析得到的元素边界在截图上画框和序号，不再依赖解析服务返回的 base64 图片
+"""
+
+from typing import Dict, List
+from PIL import Image, ImageDraw, ImageFont
+from .element_index import element_bounds
+
+
+# 可交互元素和普通元素的边框颜色
+INTERACTIVE_COLOR = (0, 200, 83)
+STATIC_COLOR = (255, 61, 0)
+
+
+def _load_font(size: int):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow < 10.1 不支持指定默认字体大小
+        return ImageFont.load_default()
+
+
+def render_labeled_image(frame: Image.Image, elements: List[Dict]) -> Image.Image:
+    """
+    在截图上绘制元素边框和序号
+
+    Args:
+        frame: 原始截图
+        elements: screen_info["elements"]，序号与元素在列表中的位置一致
+
+    Returns:
+        Image: 标注后的新图片
+    """
+    image = frame.convert("RGB")
+    draw = ImageDraw.Draw(image)
+    line_width = max(2, image.width // 400)
+    font = _load_font(max(12, image.width // 40))
+
+    for i, element in enumerate(elements):
+        bounds = element_bounds(element)
+        if bounds is None:
+            continue
+        color = INTERACTIVE_COLOR if element.get("interactivity") else STATIC_COLOR
+        draw.rectangle(bounds, outline=color, width=line_width)
+
+        # 序号标签画在边框左上角
+        label = str(element.get("index", i))
+        left, top, right, bottom = draw.textbbox((0, 0), label, font=font)
+        x, y = bounds[0], max(bounds[1] - (bottom - top) - 4, 0)
+        draw.rectangle((x, y, x + right - left + 6, y + bottom - top + 4), fill=color)
+        draw.text((x + 3 - left, y + 2 - top), label, fill=(255, 255, 255), font=font)
+
+    return image
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+OmniParser 解析结果缓存
+用截图的感知哈希加当前包名/Activity 作为键，相同或几乎相同的屏幕直接复用解析结果
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from PIL import Image
+
+
+def dhash(image: Image.Image, hash_size: int = 16) -> int:
+    """
+    计算差值感知哈希 (dHash)
+
+    Args:
+        image: Pillow 图片
+        hash_size: 哈希边长，结果为 hash_size * hash_size 位
+
+    Returns:
+        int: 哈希值
+    """
+    gray = image.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = list(gray.getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """两个哈希之间不同的位数"""
+    return bin(a ^ b).count("1")
+
+
+# 缓存键: (包名, Activity, 感知哈希)
+CacheKey = Tuple[str, str, int]
+
+
+class ParseCache:
+    """带 LRU/TTL 淘汰的解析结果缓存"""
+
+    def __init__(self,
+                 max_size: int = 32,
+                 ttl: float = 300.0,
+                 threshold: int = 3,
+                 hash_size: int = 16):
+        """
+        Args:
+            max_size: 最多缓存的屏幕数，0 表示关闭缓存
+            ttl: 缓存有效期(秒)
+            threshold: 视为同一屏幕的最大哈希距离(位)，0 表示哈希完全一致
+            hash_size: 感知哈希边长
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.threshold = threshold
+        self.hash_size = hash_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def make_key(self, image: Image.Image, package: str, activity: str) -> CacheKey:
+        """根据截图和当前应用生成缓存键"""
+        return (package, activity, dhash(image, self.hash_size))
+
+    def get(self, key: CacheKey) -> Optional[Dict]:
+        """
+        查找同一应用页面下哈希距离在阈值内的最近结果
+
+        Returns:
+            dict: 缓存的解析结果，未命中时返回 None
+        """
+        if not self.enabled:
+            return None
+        package, activity, image_hash = key
+        now = time.monotonic()
+        with self._lock:
+            best_key = None
+            best_distance = self.threshold + 1
+            for entry_key, (stored_at, _) in list(self._entries.items()):
+                if now - stored_at > self.ttl:
+                    del self._entries[entry_key]
+                    continue
+                if entry_key[0] != package or entry_key[1] != activity:
+                    continue
+                distance = hamming_distance(entry_key[2], image_hash)
+                if distance < best_distance:
+                    best_key, best_distance = entry_key, distance
+
+            if best_key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            return self._entries[best_key][1]
+
+    def put(self, key: CacheKey, result: Dict):
+        """保存解析结果，超出容量时淘汰最久未使用的条目"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """清空缓存（不重置计数）"""
+        with self._lock:
+            self._entries.clear()
+
+    def reset_stats(self):
+        """清零命中计数"""
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict:
+        """命中统计"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0
+        }
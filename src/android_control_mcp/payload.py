@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+元素响应格式
+按交互性、区域和类型过滤元素，在数量和字节预算内保留最相关的元素；
+compact 格式用共享的列名表头加每个元素一行数组，省去重复的键名
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Sequence
+from . import config
+
+
+# compact 格式的列：短列名 -> 元素字段
+COMPACT_COLUMNS = [
+    ("i", "index"),
+    ("id", "id"),
+    ("t", "type"),
+    ("c", "content"),
+    ("a", "interactive"),
+    ("x", "x"),
+    ("y", "y"),
+    ("w", "w"),
+    ("h", "h"),
+    ("s", "source"),
+    ("r", "resource_id"),
+]
+
+PAYLOAD_FORMATS = ("full", "compact")
+
+
+class ElementRecord:
+    """一个屏幕元素的紧凑表示"""
+
+    __slots__ = ("index", "id", "type", "content", "interactive", "x", "y", "w", "h", "source", "resource_id")
+
+    def __init__(self, element: Dict[str, Any]):
+        self.index = element.get("index")
+        self.id = element.get("id")
+        self.type = element.get("type")
+        self.content = element.get("content")
+        self.interactive = bool(element.get("interactivity"))
+        click_point = element.get("click_point")
+        size = element.get("size")
+        if click_point and size:
+            self.x, self.y = click_point
+            self.w, self.h = size
+        else:
+            self.x = self.y = self.w = self.h = None
+        self.source = element.get("source")
+        self.resource_id = element.get("resource_id")
+
+    def intersects(self, region: Sequence[int]) -> bool:
+        """元素边界是否与区域 (x1, y1, x2, y2) 相交，没有坐标的元素不在任何区域内"""
+        if self.x is None:
+            return False
+        x1, y1, x2, y2 = region
+        return (self.x - self.w // 2 < x2 and self.x + self.w // 2 > x1
+                and self.y - self.h // 2 < y2 and self.y + self.h // 2 > y1)
+
+    def relevance(self) -> float:
+        """预算不足时的保留优先级：可交互 > 有文本 > 面积大；没有坐标的元素最后"""
+        if self.x is None:
+            return 0.0
+        score = 1.0
+        if self.interactive:
+            score += 4.0
+        if self.content:
+            score += 2.0
+        return score + min(self.w * self.h / 1_000_000, 1.0)
+
+    def row(self, columns: Sequence[str]) -> List[Any]:
+        return [int(self.interactive) if name == "interactive" else getattr(self, name) for name in columns]
+
+    def as_dict(self) -> Dict[str, Any]:
+        """与 get_screen_info() 相同的元素格式"""
+        element = {
+            "type": self.type,
+            "content": self.content,
+            "interactivity": self.interactive,
+            "click_point": [self.x, self.y] if self.x is not None else None,
+            "size": [self.w, self.h] if self.x is not None else None,
+        }
+        for name in ("resource_id", "source", "id", "index"):
+            value = getattr(self, name)
+            if value is not None:
+                element[name] = value
+        return element
+
+
+def _size(value: Any) -> int:
+    return len(json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")) + 1
+
+
+def select_elements(records: List[ElementRecord],
+                    max_elements: int = 0,
+                    max_bytes: int = 0,
+                    columns: Optional[Sequence[str]] = None) -> List[ElementRecord]:
+    """
+    在数量和字节预算内按相关性保留元素，结果保持原有顺序
+
+    Args:
+        records: 元素
+        max_elements: 最多保留的元素数，0 表示不限制
+        max_bytes: 元素序列化后的总字节数上限，0 表示不限制
+        columns: compact 格式的列，为空时按完整格式估算字节数
+    """
+    if not max_elements and not max_bytes:
+        return records
+    ranked = sorted(range(len(records)), key=lambda i: (-records[i].relevance(), i))
+    kept, used = [], 0
+    for i in ranked:
+        if max_elements and len(kept) >= max_elements:
+            break
+        if max_bytes:
+            record = records[i]
+            size = _size(record.row(columns) if columns else record.as_dict())
+            if used + size > max_bytes:
+                # 继续尝试更小的元素
+                continue
+            used += size
+        kept.append(i)
+    return [records[i] for i in sorted(kept)]
+
+
+def shape_elements(elements: List[Dict],
+                   payload_format: str = "full",
+                   interactive_only: bool = False,
+                   region: Optional[Sequence[int]] = None,
+                   types: Optional[Sequence[str]] = None,
+                   max_elements: int = 0,
+                   max_bytes: int = 0) -> Dict[str, Any]:
+    """
+    过滤元素并生成指定格式
+
+    Args:
+        elements: 元素列表（不会被修改）
+        payload_format: full=元素字典列表, compact={"schema": 列名, "rows": 每个元素一行}
+        interactive_only: 只保留可交互元素
+        region: 只保留与区域 (x1, y1, x2, y2) 相交的元素
+        types: 只保留这些类型，如 ["text", "icon"]
+        max_elements: 最多返回的元素数，0 表示不限制
+        max_bytes: 元素部分的字节预算，0 表示不限制
+
+    Returns:
+        dict: {"elements": ..., "omitted": 被过滤或超出预算的元素数}
+    """
+    if payload_format not in PAYLOAD_FORMATS:
+        raise ValueError(f"Invalid payload format: {payload_format}")
+    if region is not None and len(region) != 4:
+        raise ValueError(f"Invalid region: {region}")
+
+    filtered = interactive_only or region is not None or types
+    if payload_format == "full" and not filtered and not max_elements and not max_bytes:
+        return {"elements": elements, "omitted": 0}
+
+    records = [ElementRecord(element) for element in elements]
+    if interactive_only:
+        records = [r for r in records if r.interactive]
+    if region is not None:
+        records = [r for r in records if r.intersects(region)]
+    if types:
+        records = [r for r in records if r.type in types]
+
+    columns = None
+    if payload_format == "compact":
+        # 只保留至少有一个元素取值的列
+        columns = [field for _, field in COMPACT_COLUMNS
+                   if any(getattr(r, field) is not None for r in records)]
+    records = select_elements(records, max_elements, max_bytes, columns)
+    omitted = len(elements) - len(records)
+
+    if payload_format == "full":
+        return {"elements": [r.as_dict() for r in records], "omitted": omitted}
+    # 预算筛选后再去掉全部为空的列
+    columns = [field for field in columns if any(getattr(r, field) is not None for r in records)]
+    short_names = {field: short for short, field in COMPACT_COLUMNS}
+    return {
+        "elements": {
+            "schema": [short_names[field] for field in columns],
+            "rows": [r.row(columns) for r in records]
+        },
+        "omitted": omitted
+    }
+
+
+def shape_screen_payload(payload: Dict[str, Any],
+                         payload_format: Optional[str] = None,
+                         interactive_only: bool = False,
+                         region: Optional[Sequence[int]] = None,
+                         types: Optional[Sequence[str]] = None,
+                         max_elements: Optional[int] = None,
+                         max_bytes: Optional[int] = None) -> Dict[str, Any]:
+    """
+    对屏幕信息响应（完整或增量）中的元素应用过滤、预算和格式，参数为空时使用服务配置
+
+    Returns:
+        dict: 新的响应，不修改传入的屏幕信息；有元素被省略时带 elements_omitted 字段
+    """
+    shaped = shape_elements(
+        payload["delta"]["added"] if "delta" in payload else payload.get("elements", []),
+        payload_format=payload_format or config.PAYLOAD_FORMAT,
+        interactive_only=interactive_only,
+        region=region,
+        types=types,
+        max_elements=config.PAYLOAD_MAX_ELEMENTS if max_elements is None else max_elements,
+        max_bytes=config.PAYLOAD_MAX_BYTES if max_bytes is None else max_bytes
+    )
+    if "delta" in payload:
+        payload = dict(payload, delta=dict(payload["delta"], added=shaped["elements"]))
+    else:
+        payload = dict(payload, elements=shaped["elements"])
+    if shaped["omitted"]:
+        payload["elements_omitted"] = shaped["omitted"]
+    return payload
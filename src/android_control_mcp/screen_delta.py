@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+屏幕增量响应
+为元素分配跨截图稳定的 ID，并只返回相对上一次截图新增、消失和移动的元素
+"""
+
+import math
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from .element_index import element_bounds
+
+
+# 位置和尺寸的容差(像素)，吸收解析结果的抖动
+MOVE_TOLERANCE = 2
+
+# 没有文本内容的元素至少需要的重叠度 (IoU)
+MIN_IOU = 0.5
+
+
+def bbox_iou(a: Tuple[int, int, int, int], b: Tuple[int, int, int, int]) -> float:
+    """两个像素边界的交并比"""
+    ix = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _content_key(element: Dict) -> Tuple[Any, Any]:
+    return element.get("type"), element.get("content") or None
+
+
+def _same_position(a: Dict, b: Dict) -> bool:
+    if a.get("click_point") is None or b.get("click_point") is None:
+        return a.get("click_point") == b.get("click_point")
+    return all(abs(p - q) <= MOVE_TOLERANCE
+               for p, q in zip(a["click_point"] + a["size"], b["click_point"] + b["size"]))
+
+
+def _match_score(previous: Dict, current: Dict) -> Optional[float]:
+    """匹配得分，越大越好；无法匹配时返回 None"""
+    prev_bounds = element_bounds(previous)
+    curr_bounds = element_bounds(current)
+    if prev_bounds is None or curr_bounds is None:
+        return 0.0 if current.get("content") else None
+    iou = bbox_iou(prev_bounds, curr_bounds)
+    if not current.get("content"):
+        # 没有文本的元素只能靠重叠度匹配
+        return iou if iou >= MIN_IOU else None
+    if iou > 0:
+        return 1.0 + iou
+    # 有相同文本但不重叠：按中心点距离，越近越好
+    (px, py), (cx, cy) = previous["click_point"], current["click_point"]
+    return 1.0 / (1.0 + math.hypot(px - cx, py - cy))
+
+
+class ScreenDeltaTracker:
+    """跟踪上一次截图的元素，为新截图分配稳定 ID 并计算增量"""
+
+    def __init__(self):
+        self._previous: List[Dict] = []
+        self._previous_info: Optional[Dict] = None
+        self._next_id = 1
+        self.capture_id = 0
+        self._lock = threading.Lock()
+
+    def _assign_ids(self, elements: List[Dict]) -> Tuple[List[Dict], List[int], List[Dict], int]:
+        """
+        与上一次截图的元素匹配并写入 id 字段
+
+        Returns:
+            tuple: (新增元素, 消失元素 ID, 移动元素, 未变化数量)
+        """
+        # 按 (类型, 文本) 分组上一次的元素
+        groups: Dict[Tuple[Any, Any], List[Dict]] = {}
+        for element in self._previous:
+            groups.setdefault(_content_key(element), []).append(element)
+
+        matched_ids = set()
+        added, moved = [], []
+        unchanged = 0
+        for element in elements:
+            best, best_score = None, None
+            for candidate in groups.get(_content_key(element), []):
+                if candidate["id"] in matched_ids:
+                    continue
+                score = _match_score(candidate, element)
+                if score is not None and (best_score is None or score > best_score):
+                    best, best_score = candidate, score
+
+            if best is None:
+                element["id"] = self._next_id
+                self._next_id += 1
+                added.append(element)
+                continue
+
+            element["id"] = best["id"]
+            matched_ids.add(best["id"])
+            if _same_position(best, element):
+                unchanged += 1
+            else:
+                moved.append({
+                    "id": element["id"],
+                    "click_point": element.get("click_point"),
+                    "size": element.get("size")
+                })
+
+        removed = [e["id"] for e in self._previous if e["id"] not in matched_ids]
+        return added, removed, moved, unchanged
+
+    def payload(self, screen_info: Dict, mode: str = "full") -> Dict:
+        """
+        生成屏幕信息响应
+
+        Args:
+            screen_info: get_screen_info() 返回的屏幕信息
+            mode: full=完整元素列表, delta=只返回相对上一次截图的变化
+
+        Returns:
+            dict: 带 capture_id 的完整屏幕信息，或带 delta 字段的增量信息
+        """
+        if mode not in ("full", "delta"):
+            raise ValueError(f"Invalid response mode: {mode}")
+
+        with self._lock:
+            base_capture = self.capture_id if self._previous_info is not None else None
+            elements = screen_info.get("elements", [])
+            if screen_info is self._previous_info:
+                # 复用的同一份屏幕状态，ID 已经分配过
+                added, removed, moved, unchanged = [], [], [], len(elements)
+            else:
+                added, removed, moved, unchanged = self._assign_ids(elements)
+                self._previous = list(elements)
+                self._previous_info = screen_info
+                self.capture_id += 1
+
+            if mode == "full" or base_capture is None:
+                return dict(screen_info, capture_id=self.capture_id)
+
+            payload = {
+                "device_info": screen_info.get("device_info"),
+                "current_app": screen_info.get("current_app"),
+                "capture_id": self.capture_id,
+                "delta": {
+                    "base_capture": base_capture,
+                    "added": added,
+                    "removed": removed,
+                    "moved": moved,
+                    "unchanged_count": unchanged
+                }
+            }
+            # 提取方式和降级标记随增量一起返回
+            for key in ("extraction", "degraded"):
+                if key in screen_info:
+                    payload[key] = screen_info[key]
+            return payload
+
+    def reset(self):
+        """丢弃基准截图，下一次响应为完整快照"""
+        with self._lock:
+            self._previous = []
+            self._previous_info = None
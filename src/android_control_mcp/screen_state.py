@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+最近一次屏幕状态缓存
+保存最近的解析结果和一个廉价的指纹，指纹仍然匹配时可以直接复用，不必重新截图解析
+"""
+
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from PIL import Image, ImageChops, ImageStat
+
+
+# 低分辨率帧的尺寸 (宽, 高)
+SIGNATURE_SIZE = (36, 64)
+
+
+def frame_signature(image: Image.Image) -> Image.Image:
+    """把截图缩成低分辨率灰度图，用于快速比较"""
+    return image.convert("L").resize(SIGNATURE_SIZE, Image.BILINEAR)
+
+
+def frame_difference(a: Image.Image, b: Image.Image) -> float:
+    """两张低分辨率灰度图的平均像素差 (0-255)"""
+    return ImageStat.Stat(ImageChops.difference(a, b)).mean[0]
+
+
+class ScreenState:
+    """一次完整解析的结果、原始截图及其指纹"""
+
+    def __init__(self,
+                 image_path: Optional[str],
+                 parsed_image_path: Optional[str],
+                 screen_info: Dict[str, Any],
+                 frame: Image.Image,
+                 capture_id: Optional[str] = None):
+        self.image_path = image_path
+        # 标注图片路径，按需渲染后写入
+        self.parsed_image_path = parsed_image_path
+        self.screen_info = screen_info
+        self.package = screen_info["current_app"]["package"]
+        self.activity = screen_info["current_app"]["activity"]
+        self.frame = frame
+        # 截图存储中的 ID，原图和标注图片共用
+        self.capture_id = capture_id
+        self.signature = frame_signature(frame)
+        self.captured_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def as_tuple(self) -> Tuple[Optional[str], Optional[str], Dict[str, Any]]:
+        """与 get_screen_info() 相同的返回格式"""
+        return self.image_path, self.parsed_image_path, self.screen_info
+
+
+class ScreenStateCache:
+    """保存最近一次屏幕状态，按指纹校验是否仍然有效"""
+
+    def __init__(self, max_age: float = 60.0, frame_threshold: float = 2.0):
+        """
+        Args:
+            max_age: 状态的最长有效期(秒)，0 表示关闭复用
+            frame_threshold: 低分辨率帧平均像素差的阈值
+        """
+        self.max_age = max_age
+        self.frame_threshold = frame_threshold
+        self._state: Optional[ScreenState] = None
+        # 界面是否可能已经变化（操作之后、重新解析之前）
+        self._stale = False
+        self._lock = threading.Lock()
+
+    def update(self,
+               image_path: Optional[str],
+               parsed_image_path: Optional[str],
+               screen_info: Dict[str, Any],
+               frame: Image.Image,
+               capture_id: Optional[str] = None) -> ScreenState:
+        """记录最新一次解析结果"""
+        state = ScreenState(image_path, parsed_image_path, screen_info, frame, capture_id)
+        with self._lock:
+            self._state = state
+            self._stale = False
+        return state
+
+    def invalidate(self):
+        """
+        界面可能已经变化：状态不再作为当前屏幕复用，
+        但仍然保留，作为增量解析比较的基准
+        """
+        with self._lock:
+            self._stale = True
+
+    @property
+    def latest(self) -> Optional[ScreenState]:
+        """最近一次状态（不做校验，可能已经过期）"""
+        return self._state
+
+    @property
+    def reusable(self) -> bool:
+        """是否有可以尝试复用的状态（之后仍需用指纹校验）"""
+        return self._state is not None and not self._stale and self.max_age > 0
+
+    def match(self, package: str, activity: str, frame: Image.Image) -> Optional[ScreenState]:
+        """
+        用当前页面和截图校验缓存的状态
+
+        Args:
+            package: 当前包名
+            activity: 当前 Activity
+            frame: 当前截图
+
+        Returns:
+            ScreenState: 指纹一致时返回缓存的状态，否则返回 None
+        """
+        state = self._state
+        if state is None or self._stale or self.max_age <= 0:
+            return None
+        if time.monotonic() - state.captured_at > self.max_age:
+            return None
+        if state.package != package or state.activity != activity:
+            return None
+        if frame_difference(state.signature, frame_signature(frame)) > self.frame_threshold:
+            return None
+        return state
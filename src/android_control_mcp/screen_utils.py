@@ -4,80 +4,140 @@
 """
 
 import uiautomator2 as u2
+import io
 import os
-import tempfile
-from datetime import datetime
-from typing import Tuple, Dict
+from typing import Tuple, Dict, List, Optional
+from PIL import Image
+from . import config
+from .capture_store import get_capture_store
+from .device_session import DeviceSession, get_session
+from .element_index import get_element_index
+from .hierarchy import Region, extract_hierarchy_elements, merge_elements, plan_extraction
+from .incremental import plan_incremental
+from .metrics import span, timed
+from .omniparser import ParserUnavailableError, get_parser
+from .lock_detector import find_lock_text
+from .overlay import render_labeled_image
+from .screen_state import ScreenState
 
 
-def get_screen_info() -> Tuple[str, str, Dict]:
+# 支持的编码格式: 名称 -> (Pillow 格式, 文件扩展名)
+IMAGE_FORMATS = {
+    "png": ("PNG", "png"),
+    "jpeg": ("JPEG", "jpg"),
+    "jpg": ("JPEG", "jpg"),
+    "webp": ("WEBP", "webp"),
+}
+
+
+def encode_image(image: Image.Image, image_format: str = "png", quality: int = 85) -> bytes:
+    """
+    在内存中编码截图
+    
+    Args:
+        image: Pillow 图片
+        image_format: 编码格式 (png/jpeg/webp)
+        quality: 有损格式的质量 (1-100)，PNG 忽略
+    
+    Returns:
+        bytes: 编码后的图片数据
+    """
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"Unsupported image format: {image_format}")
+    pil_format = IMAGE_FORMATS[image_format][0]
+    
+    buffer = io.BytesIO()
+    if pil_format == "PNG":
+        image.save(buffer, format=pil_format)
+    else:
+        # JPEG 不支持透明通道
+        if pil_format == "JPEG" and image.mode != "RGB":
+            image = image.convert("RGB")
+        image.save(buffer, format=pil_format, quality=quality)
+    return buffer.getvalue()
+
+
+@timed("screen_info")
+def get_screen_info(session: Optional[DeviceSession] = None,
+                    save_images: bool = config.SAVE_IMAGES,
+                    image_format: str = config.IMAGE_FORMAT,
+                    quality: int = config.IMAGE_QUALITY,
+                    labeled: bool = False,
+                    extraction: Optional[str] = None,
+                    incremental: Optional[bool] = None,
+                    frame: Optional[Image.Image] = None) -> Tuple[Optional[str], Optional[str], Dict]:
     """
     获取当前屏幕信息，自动处理锁屏情况
     
+    截图在内存中编码后直接上传给 OmniParser，只有 save_images 为 True 时才写入磁盘；
+    标注图片只在 labeled 为 True 时根据元素边界在本地绘制
+    
+    Args:
+        session: 设备会话，为空时使用默认会话
+        save_images: 是否保存原始截图
+        image_format: 上传编码格式 (png/jpeg/webp)
+        quality: 有损格式的质量
+        labeled: 是否绘制并保存标注图片
+        extraction: 元素提取方式 (vision/hybrid/hierarchy)，为空时使用配置
+        incremental: 是否只解析相对上一次截图变化的区域，为空时使用配置
+        frame: 调用方刚刚截取的全分辨率画面，直接使用而不再截图（需要点亮或解锁屏幕时忽略）
+    
     Returns:
-        tuple: (原始截图路径, 标注图片路径, 屏幕信息字典)
+        tuple: (原始截图路径, 标注图片路径, 屏幕信息字典)，未保存时路径为 None
     """
-    # 连接设备
-    d = u2.connect()
+    # 复用会话中的设备连接
+    if session is None:
+        session = get_session()
+    extraction = (extraction or config.EXTRACTION_MODE).lower()
+    if extraction not in ("vision", "hybrid", "hierarchy"):
+        raise ValueError(f"Invalid extraction mode: {extraction}")
     
-    # 检查屏幕状态
-    screen_on = d.info.get("screenOn", False)
+    # 检查屏幕状态（一次 d.info 读取，同时刷新静态属性缓存，断线时自动重连）
+    with span("device_info"):
+        info = session.refresh_info()
+    screen_on = info.get("screenOn", False)
+    width = info["displayWidth"]
+    height = info["displayHeight"]
+    d = session.device
     is_locked = False
     
     # 如果屏幕关闭，先点亮屏幕
     if not screen_on:
         d.screen_on()
+        # 熄屏后大概率进入锁屏，清空免检记录
+        session.lock_detector.invalidate()
         # 等待屏幕完全点亮
         import time
-        time.sleep(0.5)
+        with span("wake_wait"):
+            time.sleep(0.5)
     
-    # 检查是否在锁屏界面
-    current_app = d.app_current()
-    is_locked = False
+    # 检查是否在锁屏界面（一次层级 dump，近期确认未锁屏的包名直接跳过）
+    with span("app_current"):
+        current_app = d.app_current()
     
     print(f"当前应用包名: {current_app['package']}")
     
-    # 方法1: 通过屏幕元素内容判断（更可靠）
-    # 检查是否有特定的锁屏文本
-    screen_texts = []
-    try:
-        # 获取屏幕上的所有文本
-        for elem in d(className="android.widget.TextView"):
-            text = elem.info.get("text", "")
-            if text:
-                screen_texts.append(text)
-        
-        print(f"屏幕文本: {screen_texts[:5]}")  # 只打印前5个
-        
-        # 锁屏特征文本
-        lock_keywords = ["仅限紧急呼叫", "滑动解锁", "向上滑动解锁", "Emergency calls only"]
-        for text in screen_texts:
-            if any(keyword in text for keyword in lock_keywords):
-                is_locked = True
-                print(f"检测到锁屏关键词: {text}")
-                break
-    except:
-        pass
-    
-    # 方法2: 检查系统UI包
-    if not is_locked and current_app["package"] in ["com.android.systemui", "com.miui.aod", "com.android.keyguard"]:
-        is_locked = True
-        print("检测到系统UI包，判定为锁屏")
+    # 层级提取模式下只 dump 一次层级，锁屏检测和元素提取共用
+    hierarchy = None
+    if extraction != "vision":
+        with span("hierarchy_dump"):
+            hierarchy = d.dump_hierarchy()
+    with span("lock_check"):
+        is_locked = session.lock_detector.is_locked(d, current_app["package"], hierarchy=hierarchy)
     
     # 如果检测到锁屏，自动尝试解锁
+    unlock_attempted = is_locked
     if is_locked:
         print("检测到锁屏状态，正在尝试解锁...")
-        unlock_screen(d)
+        with span("unlock"):
+            unlock_screen(d, size=(width, height))
         # 重新检查是否还在锁屏
         current_app = d.app_current()
         # 再次检查锁屏文本
         still_locked = False
         try:
-            for elem in d(className="android.widget.TextView"):
-                text = elem.info.get("text", "")
-                if any(keyword in text for keyword in ["仅限紧急呼叫", "滑动解锁", "Emergency calls only"]):
-                    still_locked = True
-                    break
+            hierarchy = d.dump_hierarchy()
+            still_locked = find_lock_text(hierarchy) is not None
         except:
             pass
         
@@ -87,33 +147,159 @@ def get_screen_info() -> Tuple[str, str, Dict]:
         else:
             print("✗ 仍在锁屏界面")
     
-    # 创建临时文件名
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    temp_dir = tempfile.gettempdir()
+    # 截取屏幕（点亮或解锁后画面已经变化，不能使用调用方传入的截图）
+    if frame is None or not screen_on or unlock_attempted:
+        with span("screenshot"):
+            frame = session.screenshot()
+    
+    # 先用界面层级提取元素，决定是否还需要视觉解析
+    plan = "vision"
+    hierarchy_elements: List[Dict] = []
+    vision_regions: List[Region] = []
+    if extraction != "vision":
+        with span("hierarchy_extract"):
+            hierarchy_elements, vision_regions = extract_hierarchy_elements(hierarchy, width, height)
+        if extraction == "hierarchy":
+            plan = "hierarchy"
+        else:
+            plan = plan_extraction(hierarchy_elements, vision_regions, width, height)
+    
+    # OmniParser 熔断期间不再发送请求，需要视觉解析时直接降级为界面层级
+    parser_down = False
+    if plan != "hierarchy" and config.DEGRADED_MODE:
+        parser_down = get_parser().breaker.is_open()
+    
+    # 查找解析缓存（感知哈希 + 当前页面），命中时跳过 OmniParser
+    cache = session.parse_cache
+    cache_key = None
+    result = None
+    if plan == "vision" and cache.enabled:
+        with span("parse_cache"):
+            cache_key = cache.make_key(frame, current_app["package"], current_app["activity"])
+            result = cache.get(cache_key)
+    
+    # 缓存未命中时，尝试只解析变化的区域，其余元素沿用上一次结果
+    incremental_elements = None
+    if incremental is None:
+        incremental = config.INCREMENTAL_PARSE
+    if extraction == "vision" and result is None and incremental and not parser_down:
+        try:
+            with span("incremental_parse"):
+                incremental_elements = parse_changed_regions(session, frame, current_app, image_format, quality)
+        except ParserUnavailableError:
+            if not config.DEGRADED_MODE:
+                raise
+            parser_down = True
+    
+    # 关闭持久化时截图不会落盘，也就不必为保存而编码
+    save_images = save_images and config.CAPTURE_PERSIST
+    image_data = None
+    if (plan == "vision" and result is None and incremental_elements is None and not parser_down) or save_images:
+        with span("encode"):
+            image_data = encode_image(frame, image_format, quality)
     
-    # 生成文件路径
-    image_path = os.path.join(temp_dir, f"screen_{timestamp}.png")
-    parsed_image_path = os.path.join(temp_dir, f"screen_labeled_{timestamp}.png")
+    image_path = None
+    capture_id = None
+    if save_images:
+        # 写入有上限的截图存储，关闭持久化时不落盘
+        with span("save_image"):
+            record = get_capture_store().save(image_data, "screen", IMAGE_FORMATS[image_format][1])
+        if record is not None:
+            image_path, capture_id = record.path, record.capture_id
     
-    # 截取屏幕
-    d.screenshot(image_path)
+    degraded = False
+    try:
+        if incremental_elements is not None:
+            simplified_elements = incremental_elements
+        elif plan == "vision":
+            # 使用 OmniParser 解析（直接上传内存数据，不请求服务端标注图片）
+            if result is None:
+                if parser_down:
+                    raise ParserUnavailableError("OmniParser unavailable (circuit open)")
+                with span("omniparser"):
+                    result = get_parser().parse(image_data, return_labeled=False, image_format=image_format)
+                if cache_key is not None:
+                    cache.put(cache_key, result)
+            else:
+                print("解析缓存命中，跳过 OmniParser")
+            
+            # 构建屏幕信息（精简格式）
+            simplified_elements = simplify_elements(result["elements"], (0, 0, width, height))
+            if extraction != "vision":
+                for element in simplified_elements:
+                    element["source"] = "vision"
+                simplified_elements = merge_elements(hierarchy_elements, simplified_elements)
+        elif plan == "regions":
+            if parser_down:
+                raise ParserUnavailableError("OmniParser unavailable (circuit open)")
+            # 只把层级无法描述的区域裁剪出来解析
+            print(f"层级提取 {len(hierarchy_elements)} 个元素，视觉解析 {len(vision_regions)} 个区域")
+            with span("omniparser_regions"):
+                region_elements = parse_regions(frame, vision_regions, image_format, quality)
+            simplified_elements = merge_elements(hierarchy_elements, region_elements)
+        else:
+            print(f"层级提取 {len(hierarchy_elements)} 个元素，跳过 OmniParser")
+            simplified_elements = hierarchy_elements
+    except ParserUnavailableError as e:
+        if not config.DEGRADED_MODE:
+            raise
+        # 降级：只返回界面层级能描述的元素
+        print(f"OmniParser 不可用，降级为界面层级提取: {e}")
+        degraded = True
+        if extraction == "vision":
+            with span("hierarchy_dump"):
+                hierarchy = hierarchy or d.dump_hierarchy()
+            with span("hierarchy_extract"):
+                hierarchy_elements, _ = extract_hierarchy_elements(hierarchy, width, height)
+        simplified_elements = hierarchy_elements
     
-    # 使用 OmniParser 解析
-    from .omniparser import OmniParser
-    parser = OmniParser()
-    result = parser.parse(image_path, return_labeled=True)
+    screen_info = {
+        "device_info": {
+            "size": [width, height],
+            "screen_on": screen_on,
+            "is_locked": is_locked
+        },
+        "current_app": {
+            "package": current_app["package"],
+            "activity": current_app["activity"]
+        },
+        "elements": simplified_elements
+    }
+    if extraction != "vision" or degraded:
+        screen_info["extraction"] = "hierarchy" if degraded else plan
+    if degraded:
+        screen_info["degraded"] = True
+    
+    # 记录为最近一次屏幕状态，供后续操作复用
+    with span("screen_state"):
+        state = session.screen_state.update(image_path, None, screen_info, frame, capture_id)
+    
+    parsed_image_path = None
+    if labeled:
+        with span("render_labeled"):
+            parsed_image_path = save_labeled_image(state)
+    
+    return image_path, parsed_image_path, screen_info
+
+
+def simplify_elements(elements: List[Dict], region: Region) -> List[Dict]:
+    """
+    把 OmniParser 返回的归一化 bbox 转成屏幕像素坐标的 click_point 和 size
     
-    # 保存标注图片
-    if result.get("labeled_image"):
-        parser.save_labeled_image(result, parsed_image_path)
+    Args:
+        elements: OmniParser 返回的元素列表
+        region: 被解析图片在屏幕上的像素区域 (x1, y1, x2, y2)，整屏时为 (0, 0, 宽, 高)
     
-    # 构建屏幕信息（精简格式）
-    width = d.info["displayWidth"]
-    height = d.info["displayHeight"]
+    Returns:
+        list: 精简格式的元素列表
+    """
+    left, top = region[0], region[1]
+    width = region[2] - region[0]
+    height = region[3] - region[1]
     
     # 转换所有元素的格式，保留所有元素
     simplified_elements = []
-    for element in result["elements"]:
+    for element in elements:
         bbox = element.get("bbox", [])
         
         # 初始化元素信息
@@ -125,8 +311,8 @@ def get_screen_info() -> Tuple[str, str, Dict]:
         
         # 如果有 bbox，计算点击坐标和尺寸
         if len(bbox) == 4:
-            center_x = int((bbox[0] + bbox[2]) / 2 * width)
-            center_y = int((bbox[1] + bbox[3]) / 2 * height)
+            center_x = left + int((bbox[0] + bbox[2]) / 2 * width)
+            center_y = top + int((bbox[1] + bbox[3]) / 2 * height)
             elem_width = int((bbox[2] - bbox[0]) * width)
             elem_height = int((bbox[3] - bbox[1]) * height)
             
@@ -138,21 +324,136 @@ def get_screen_info() -> Tuple[str, str, Dict]:
             simplified_element["size"] = None
         
         simplified_elements.append(simplified_element)
+    return simplified_elements
+
+
+def parse_changed_regions(session: DeviceSession,
+                          frame: Image.Image,
+                          current_app: Dict,
+                          image_format: str = config.IMAGE_FORMAT,
+                          quality: int = config.IMAGE_QUALITY) -> Optional[List[Dict]]:
+    """
+    与最近一次屏幕状态逐块比较，只解析变化的区域
     
-    screen_info = {
-        "device_info": {
-            "size": [width, height],
-            "screen_on": screen_on,
-            "is_locked": is_locked
-        },
-        "current_app": {
-            "package": current_app["package"],
-            "activity": current_app["activity"]
-        },
-        "elements": simplified_elements
-    }
+    Args:
+        session: 设备会话
+        frame: 当前截图
+        current_app: 当前应用 (package/activity)
+        image_format: 上传编码格式
+        quality: 有损格式的质量
     
-    return image_path, parsed_image_path, screen_info
+    Returns:
+        list: 合并后的元素列表；没有可用的基准或变化面积过大时返回 None
+    """
+    state = session.screen_state.latest
+    if state is None or state.package != current_app["package"] or state.activity != current_app["activity"]:
+        return None
+    if state.screen_info.get("degraded"):
+        # 降级结果只有层级元素，不能作为增量解析的基准
+        return None
+    
+    with state.lock:
+        previous_frame = state.frame
+        previous_elements = state.screen_info["elements"]
+    planned = plan_incremental(previous_frame, frame, previous_elements,
+                               tile_size=config.INCREMENTAL_TILE_SIZE,
+                               threshold=config.INCREMENTAL_TILE_THRESHOLD,
+                               max_ratio=config.INCREMENTAL_MAX_AREA)
+    if planned is None:
+        return None
+    
+    regions, kept = planned
+    print(f"增量解析 {len(regions)} 个变化区域，沿用 {len(kept)} 个元素")
+    elements = list(kept)
+    for element in parse_regions(frame, regions, image_format, quality):
+        element.pop("source", None)
+        elements.append(element)
+    # 与整屏解析一样按从上到下排列
+    elements.sort(key=lambda e: (e["click_point"][1] - e["size"][1] // 2, e["click_point"][0])
+                  if e.get("click_point") and e.get("size") else (-1, -1))
+    return elements
+
+
+def parse_regions(frame: Image.Image,
+                  regions: List[Region],
+                  image_format: str = config.IMAGE_FORMAT,
+                  quality: int = config.IMAGE_QUALITY) -> List[Dict]:
+    """
+    裁剪屏幕的多个区域，一次交给 OmniParser 批量解析，坐标映射回整屏
+    
+    Args:
+        frame: 整屏截图
+        regions: 像素区域 (x1, y1, x2, y2) 列表
+        image_format: 上传编码格式
+        quality: 有损格式的质量
+    
+    Returns:
+        list: 精简格式的元素列表，source 为 vision
+    """
+    images = [encode_image(frame.crop(region), image_format, quality) for region in regions]
+    results = get_parser().parse_many(images, return_labeled=False, image_format=image_format)
+    elements = []
+    for region, result in zip(regions, results):
+        for element in simplify_elements(result["elements"], region):
+            element["source"] = "vision"
+            elements.append(element)
+    return elements
+
+
+def save_labeled_image(state: ScreenState) -> Optional[str]:
+    """
+    在本地绘制屏幕状态的标注图片并保存，同一次截图只绘制一次（已被淘汰时重新绘制）
+    
+    Args:
+        state: 屏幕状态
+    
+    Returns:
+        str: 标注图片路径，关闭持久化时返回 None
+    """
+    with state.lock:
+        if state.parsed_image_path is None or not os.path.exists(state.parsed_image_path):
+            image = render_labeled_image(state.frame, state.screen_info["elements"])
+            buffer = io.BytesIO()
+            image.save(buffer, format="PNG")
+            record = get_capture_store().save(buffer.getvalue(), "labeled", "png", state.capture_id)
+            if record is None:
+                return None
+            state.parsed_image_path = record.path
+            state.capture_id = record.capture_id
+        return state.parsed_image_path
+
+
+def get_cached_screen_info(session: Optional[DeviceSession] = None, **kwargs) -> Tuple[Optional[str], Optional[str], Dict]:
+    """
+    优先复用最近一次屏幕状态，只在指纹（当前页面 + 低分辨率截图）不匹配时重新获取
+    
+    Args:
+        session: 设备会话，为空时使用默认会话
+        **kwargs: 需要重新获取时传给 get_screen_info() 的参数
+    
+    Returns:
+        tuple: 与 get_screen_info() 相同
+    """
+    if session is None:
+        session = get_session()
+    
+    if session.screen_state.reusable:
+        try:
+            current_app = session.call(lambda d: d.app_current())
+            # 指纹只需要低分辨率画面：优先使用视频流帧或设备端缩略图
+            frame = session.capture.sample(session)
+            if frame is None:
+                # 没有廉价画面时截一次全分辨率截图，不匹配时交给 get_screen_info 继续使用
+                frame = session.screenshot()
+                kwargs.setdefault("frame", frame)
+            state = session.screen_state.match(current_app["package"], current_app["activity"], frame)
+            if state is not None:
+                print("复用最近一次屏幕状态")
+                return state.as_tuple()
+        except Exception as e:
+            print(f"校验屏幕状态失败: {e}")
+    
+    return get_screen_info(session, **kwargs)
 
 
 def find_elements_by_text(screen_info: Dict, text: str) -> list:
@@ -166,18 +467,8 @@ def find_elements_by_text(screen_info: Dict, text: str) -> list:
     Returns:
         list: 匹配的元素列表
     """
-    matches = []
-    for element in screen_info["elements"]:
-        content = element.get("content", "")
-        element_text = element.get("text", "")
-        
-        # 检查 content 字段
-        if content and isinstance(content, str) and text in content:
-            matches.append(element)
-        # 检查 text 字段
-        elif element_text and isinstance(element_text, str) and text in element_text:
-            matches.append(element)
-    return matches
+    # 文本索引每次解析只建立一次
+    return get_element_index(screen_info).find_text(text, case_sensitive=True)
 
 
 def get_clickable_elements(screen_info: Dict) -> list:
@@ -190,23 +481,25 @@ def get_clickable_elements(screen_info: Dict) -> list:
     Returns:
         list: 可点击元素列表
     """
-    return [e for e in screen_info["elements"] 
-            if e.get("interactivity", False) or e.get("clickable", False)]
+    return get_element_index(screen_info).interactive_elements()
 
 
-def unlock_screen(d: u2.Device, password: str = None) -> bool:
+def unlock_screen(d: u2.Device, password: str = None, size: Optional[Tuple[int, int]] = None) -> bool:
     """
     解锁屏幕 - 简单向上滑动
     
     Args:
         d: uiautomator2 设备对象
         password: 解锁密码（如果需要）
+        size: 已知的屏幕尺寸 (宽, 高)，为空时从设备读取
     
     Returns:
         bool: 是否成功解锁
     """
-    width = d.info["displayWidth"]
-    height = d.info["displayHeight"]
+    if size is None:
+        info = d.info
+        size = (info["displayWidth"], info["displayHeight"])
+    width, height = size
     
     # 向上滑动解锁
     print("正在向上滑动解锁...")
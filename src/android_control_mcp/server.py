@@ -4,25 +4,144 @@ Android Control MCP Server
 提供Android设备屏幕信息获取和控制功能的MCP工具
 """
 
+import asyncio
+import functools
 import json
 import time
 import uiautomator2 as u2
-from typing import Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, List, Optional
 from mcp.server.fastmcp import FastMCP
-from .screen_utils import get_screen_info
+from . import config
+from .capture_store import get_capture_store
+from .device_session import DeviceSession, get_session, registry
+from .element_index import get_element_index
+from .hierarchy import find_nodes, hierarchy_signature
+from .metrics import metrics, span, timed
+from .omniparser import get_parser
+from .payload import shape_screen_payload
+from .screen_state import frame_difference, frame_signature
+from .screen_utils import get_cached_screen_info, get_screen_info, save_labeled_image
+from .settle import wait_for_settle
 
 # 创建MCP服务器
 mcp = FastMCP("android-control")
 
-# 全局设备连接
-device = None
+# 阻塞的设备 RPC、等待和解析请求都放到有界线程池中执行，不阻塞事件循环
+executor = ThreadPoolExecutor(max_workers=config.TOOL_WORKERS, thread_name_prefix="android-tool")
 
-def get_device():
-    """获取或创建设备连接"""
-    global device
-    if device is None:
-        device = u2.connect()
-    return device
+async def run_blocking(func: Callable, *args, **kwargs) -> Any:
+    """在线程池中执行阻塞函数"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+def traced_call(func: Callable, *args, **kwargs) -> Any:
+    """在当前线程执行工具函数，按配置把本次调用的阶段耗时附加到响应中"""
+    with metrics.trace() as trace:
+        result = func(*args, **kwargs)
+    if config.METRICS_BREAKDOWN and isinstance(result, dict):
+        result["timings"] = {name: round(seconds * 1000, 1) for name, seconds in trace.items()}
+    return result
+
+def device_tool(exclusive: bool = True):
+    """把同步工具函数包装成异步处理函数，并统计工具耗时
+    
+    Args:
+        exclusive: 是否持有设备锁执行；截图、操作等会改变或依赖屏幕状态的工具需要串行，
+                   只读的轻量查询可以在截图进行中并发执行
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                if not exclusive:
+                    return await run_blocking(traced_call, func, *args, **kwargs)
+                # 首次不指定设备时需要连接默认设备解析序列号，不能阻塞事件循环
+                try:
+                    session = await run_blocking(get_session, kwargs.get("device"))
+                except Exception as e:
+                    # 没有可用设备时与工具内部的错误一样返回错误信息
+                    return {
+                        "success": False,
+                        "error": str(e)
+                    }
+                async with session.async_lock:
+                    metrics.observe("stage", "device_lock_wait", time.perf_counter() - started)
+                    return await run_blocking(traced_call, func, *args, **kwargs)
+            finally:
+                metrics.observe("tool", func.__name__, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+def get_device(serial: Optional[str] = None) -> u2.Device:
+    """获取设备会话中的设备连接"""
+    return get_session(serial).device
+
+def swipe_coordinates(direction: str, screen_width: int, screen_height: int) -> Optional[tuple]:
+    """根据方向计算滑动起止坐标，方向无效时返回 None"""
+    if direction == 'up':
+        return (screen_width // 2, int(screen_height * 0.7),
+                screen_width // 2, int(screen_height * 0.3))
+    elif direction == 'down':
+        return (screen_width // 2, int(screen_height * 0.3),
+                screen_width // 2, int(screen_height * 0.7))
+    elif direction == 'left':
+        return (int(screen_width * 0.7), screen_height // 2,
+                int(screen_width * 0.3), screen_height // 2)
+    elif direction == 'right':
+        return (int(screen_width * 0.3), screen_height // 2,
+                int(screen_width * 0.7), screen_height // 2)
+    return None
+
+@timed("input_text")
+def input_text(session: DeviceSession, text: str, clear_before: bool = False, slowly: bool = False) -> Dict[str, Any]:
+    """在当前焦点输入文本（不等待、不截图）
+    
+    输入法在会话内保持启用；清空和输入在同一条 shell 命令中完成，逐字输入的间隔在设备端等待
+    """
+    return session.input.type(session, text, clear=clear_before, slowly=slowly)
+
+def run_action(session: DeviceSession, step: Dict[str, Any]):
+    """执行一个批量动作（不截图）
+    
+    支持的动作:
+        click: x, y
+        long_click: x, y, duration(默认1.0)
+        double_click: x, y
+        swipe: direction 或 start_x/start_y/end_x/end_y, duration(默认0.5)
+        text: text, clear_before, slowly
+        key: key (如 back/home/enter/delete)
+        wait: seconds，或 settle=true 等待界面稳定
+    """
+    action = step.get("action")
+    if action == "click":
+        session.act(lambda d: d.click(step["x"], step["y"]))
+    elif action == "long_click":
+        session.act(lambda d: d.long_click(step["x"], step["y"], step.get("duration", 1.0)))
+    elif action == "double_click":
+        session.act(lambda d: d.double_click(step["x"], step["y"]))
+    elif action == "swipe":
+        duration = step.get("duration", 0.5)
+        if step.get("direction"):
+            screen_width, screen_height = session.display_size()
+            points = swipe_coordinates(step["direction"], screen_width, screen_height)
+            if points is None:
+                raise ValueError(f"Invalid direction: {step['direction']}")
+        else:
+            points = (step["start_x"], step["start_y"], step["end_x"], step["end_y"])
+        session.act(lambda d: d.swipe(*points, duration))
+    elif action == "text":
+        input_text(session, step["text"], step.get("clear_before", False), step.get("slowly", False))
+    elif action == "key":
+        session.act(lambda d: d.press(step["key"]))
+    elif action == "wait":
+        if step.get("settle"):
+            wait_for_settle(session, timeout=step.get("seconds", config.SETTLE_TIMEOUT))
+        else:
+            time.sleep(step.get("seconds", 0.5))
+    else:
+        raise ValueError(f"Invalid action: {action}")
 
 def add_click_points(screen_info: Dict[str, Any]) -> Dict[str, Any]:
     """为元素添加索引（新格式已包含click_point）"""
@@ -33,17 +152,57 @@ def add_click_points(screen_info: Dict[str, Any]) -> Dict[str, Any]:
     
     return screen_info
 
+def screen_payload(session: DeviceSession,
+                   screen_info: Dict[str, Any],
+                   response_mode: Optional[str] = None,
+                   **shape) -> Dict[str, Any]:
+    """按响应模式生成屏幕信息：full 为完整元素列表，delta 只含相对上一次截图的变化；
+    shape 为 shape_screen_payload() 的过滤、预算和格式参数，未指定的按服务配置"""
+    screen_info = add_click_points(screen_info)
+    payload = session.delta_tracker.payload(screen_info, response_mode or config.RESPONSE_MODE)
+    with span("payload"):
+        return shape_screen_payload(payload, **shape)
+
 @mcp.tool()
-def android_get_screen_info() -> Dict[str, Any]:
-    """获取当前Android屏幕信息，包含截图、元素识别和点击坐标"""
+@device_tool()
+def android_get_screen_info(
+    save_images: bool = config.SAVE_IMAGES,
+    response_mode: Optional[str] = None,
+    labeled: bool = False,
+    payload_format: Optional[str] = None,
+    interactive_only: bool = False,
+    region: Optional[List[int]] = None,
+    element_types: Optional[List[str]] = None,
+    max_elements: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    device: Optional[str] = None
+) -> Dict[str, Any]:
+    """获取当前Android屏幕信息，包含截图、元素识别和点击坐标
+    
+    Args:
+        save_images: 是否把原始截图保存到磁盘（返回 image_path）
+        response_mode: full 返回完整元素列表，delta 只返回相对上一次截图新增/消失/移动的元素，默认按服务配置
+        labeled: 是否同时生成标注图片（返回 parsed_image_path）
+        payload_format: full 为元素字典列表，compact 为 {"schema": 短列名, "rows": 每个元素一行}，默认按服务配置
+        interactive_only: 只返回可交互元素
+        region: 只返回与区域 [x1, y1, x2, y2] 相交的元素
+        element_types: 只返回这些类型的元素，如 ["text", "icon"]
+        max_elements: 最多返回的元素数，超出时优先保留可交互、有文本的元素，0 表示不限制，默认按服务配置
+        max_bytes: 元素部分的字节预算，0 表示不限制，默认按服务配置
+        device: 设备序列号或地址，为空时使用默认设备
+    """
     try:
-        image_path, parsed_path, screen_info = get_screen_info()
-        screen_info = add_click_points(screen_info)
+        session = get_session(device)
+        image_path, parsed_path, screen_info = get_screen_info(session, save_images=save_images, labeled=labeled)
+        screen_info = screen_payload(session, screen_info, response_mode,
+                                     payload_format=payload_format, interactive_only=interactive_only,
+                                     region=region, types=element_types,
+                                     max_elements=max_elements, max_bytes=max_bytes)
         
         return {
             "success": True,
             "data": {
-                # "image_path": image_path,
+                "image_path": image_path,
                 "parsed_image_path": parsed_path,
                 "screen_info": screen_info
             }
@@ -55,52 +214,178 @@ def android_get_screen_info() -> Dict[str, Any]:
         }
 
 @mcp.tool()
-def android_click(x: int, y: int) -> Dict[str, Any]:
+@device_tool()
+def android_get_labeled_image(device: Optional[str] = None) -> Dict[str, Any]:
+    """生成当前屏幕的标注图片（元素边框和序号，序号与 elements 的 index 一致）
+    
+    Args:
+        device: 设备序列号或地址，为空时使用默认设备
+    """
+    try:
+        session = get_session(device)
+        get_cached_screen_info(session)
+        state = session.screen_state.latest
+        parsed_path = save_labeled_image(state)
+        
+        return {
+            "success": True,
+            "data": {
+                "parsed_image_path": parsed_path,
+                "current_app": state.screen_info["current_app"]
+            }
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+def get_current_index(session: DeviceSession):
+    """获取当前屏幕（优先复用最近一次有效状态）及其元素索引"""
+    _, _, screen_info = get_cached_screen_info(session)
+    screen_info = add_click_points(screen_info)
+    return screen_info, get_element_index(screen_info)
+
+@mcp.tool()
+@device_tool()
+def android_element_at(x: int, y: int, device: Optional[str] = None) -> Dict[str, Any]:
+    """查找当前屏幕上包含指定坐标的元素（最小、最上层的优先）
+    
+    Args:
+        x: X坐标
+        y: Y坐标
+        device: 设备序列号或地址，为空时使用默认设备
+    """
+    try:
+        session = get_session(device)
+        screen_info, index = get_current_index(session)
+        elements = index.elements_at(x, y)
+        
+        return {
+            "success": True,
+            "data": {
+                "position": {"x": x, "y": y},
+                "element": elements[0] if elements else None,
+                "overlapping_count": len(elements)
+            }
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+@mcp.tool()
+@device_tool()
+def android_elements_in_region(
+    x1: int,
+    y1: int,
+    x2: int,
+    y2: int,
+    fully_inside: bool = False,
+    device: Optional[str] = None
+) -> Dict[str, Any]:
+    """查找当前屏幕指定矩形区域内的元素
+    
+    Args:
+        x1: 区域左上角X坐标
+        y1: 区域左上角Y坐标
+        x2: 区域右下角X坐标
+        y2: 区域右下角Y坐标
+        fully_inside: 是否只返回完全位于区域内的元素（默认返回相交的元素）
+        device: 设备序列号或地址，为空时使用默认设备
+    """
+    try:
+        session = get_session(device)
+        screen_info, index = get_current_index(session)
+        elements = index.elements_in_rect(x1, y1, x2, y2, fully_inside)
+        
+        return {
+            "success": True,
+            "data": {
+                "region": [x1, y1, x2, y2],
+                "matched_count": len(elements),
+                "elements": elements
+            }
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+@mcp.tool()
+@device_tool()
+def android_nearest_element(x: int, y: int, max_distance: Optional[int] = None, device: Optional[str] = None) -> Dict[str, Any]:
+    """查找当前屏幕上离指定坐标最近的可交互元素
+    
+    Args:
+        x: X坐标
+        y: Y坐标
+        max_distance: 最大像素距离，超出时视为未找到
+        device: 设备序列号或地址，为空时使用默认设备
+    """
+    try:
+        session = get_session(device)
+        screen_width, screen_height = session.display_size()
+        if not (0 <= x < screen_width and 0 <= y < screen_height):
+            return {
+                "success": False,
+                "error": f"Coordinates ({x}, {y}) are outside the screen ({screen_width}x{screen_height})"
+            }
+        screen_info, index = get_current_index(session)
+        element, distance = index.nearest_element(x, y, interactive_only=True, max_distance=max_distance)
+        
+        return {
+            "success": True,
+            "data": {
+                "position": {"x": x, "y": y},
+                "element": element,
+                "distance": distance
+            }
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+@mcp.tool()
+@device_tool()
+def android_click(x: int, y: int, device: Optional[str] = None) -> Dict[str, Any]:
     """点击Android屏幕指定坐标
     
     Args:
         x: X坐标
         y: Y坐标
+        device: 设备序列号或地址，为空时使用默认设备
     """
     try:
-        # 获取点击前的屏幕信息
-        before_image_path, before_parsed_path, before_screen_info = get_screen_info()
+        session = get_session(device)
+        # 获取点击前的屏幕信息（优先复用最近一次仍然有效的屏幕状态）
+        before_image_path, before_parsed_path, before_screen_info = get_cached_screen_info(session)
         before_screen_info = add_click_points(before_screen_info)
         
-        # 查找点击位置对应的元素
-        clicked_element = None
-        
-        # 新格式使用 click_point 和 size 判断
-        for element in before_screen_info.get('elements', []):
-            click_point = element.get('click_point', [])
-            size = element.get('size', [])
-            if len(click_point) == 2 and len(size) == 2:
-                cx, cy = click_point
-                w, h = size
-                # 判断点击位置是否在元素范围内
-                # 使用整数运算避免浮点数问题
-                half_w = w // 2
-                half_h = h // 2
-                if (cx - half_w <= x <= cx + half_w and 
-                    cy - half_h <= y <= cy + half_h):
-                    clicked_element = element
-                    break
+        # 查找点击位置对应的元素（包含该点的最小元素，即最上层）
+        clicked_element = get_element_index(before_screen_info).element_at(x, y)
+        before_screen_info = screen_payload(session, before_screen_info)
         
         # 执行点击
-        d = get_device()
-        d.click(x, y)
+        with span("action"):
+            session.act(lambda d: d.click(x, y))
         
-        # 等待UI更新
-        time.sleep(1)
+        # 等待UI稳定
+        settle_time = wait_for_settle(session)
         
         # 获取点击后的屏幕信息
-        after_image_path, after_parsed_path, after_screen_info = get_screen_info()
-        after_screen_info = add_click_points(after_screen_info)
+        after_image_path, after_parsed_path, after_screen_info = get_screen_info(session)
+        after_screen_info = screen_payload(session, after_screen_info)
         
         return {
             "success": True,
             "data": {
                 "clicked_position": {"x": x, "y": y},
+                "settle_time": round(settle_time, 3),
                 "before_click": {
                     # "image_path": before_image_path,
                     "parsed_image_path": before_parsed_path,
@@ -121,13 +406,15 @@ def android_click(x: int, y: int) -> Dict[str, Any]:
         }
 
 @mcp.tool()
+@device_tool()
 def android_swipe(
     direction: Optional[str] = None,
     start_x: Optional[int] = None,
     start_y: Optional[int] = None,
     end_x: Optional[int] = None,
     end_y: Optional[int] = None,
-    duration: float = 0.5
+    duration: float = 0.5,
+    device: Optional[str] = None
 ) -> Dict[str, Any]:
     """在Android屏幕上滑动
     
@@ -138,57 +425,42 @@ def android_swipe(
         end_x: 结束X坐标
         end_y: 结束Y坐标
         duration: 滑动持续时间(秒)
+        device: 设备序列号或地址，为空时使用默认设备
     """
     try:
-        d = get_device()
-        screen_width = d.info['displayWidth']
-        screen_height = d.info['displayHeight']
+        session = get_session(device)
         if direction:
-            # 方向滑动
-            if direction == 'up':
-                start_y_calc = int(screen_height * 0.7)
-                end_y_calc = int(screen_height * 0.3)
-                d.swipe(screen_width // 2, start_y_calc,
-                       screen_width // 2, end_y_calc, duration)
-            elif direction == 'down':
-                start_y_calc = int(screen_height * 0.3)
-                end_y_calc = int(screen_height * 0.7)
-                d.swipe(screen_width // 2, start_y_calc,
-                       screen_width // 2, end_y_calc, duration)
-            elif direction == 'left':
-                start_x_calc = int(screen_width * 0.7)
-                end_x_calc = int(screen_width * 0.3)
-                d.swipe(start_x_calc, screen_height // 2,
-                       end_x_calc, screen_height // 2, duration)
-            elif direction == 'right':
-                start_x_calc = int(screen_width * 0.3)
-                end_x_calc = int(screen_width * 0.7)
-                d.swipe(start_x_calc, screen_height // 2,
-                       end_x_calc, screen_height // 2, duration)
-            else:
+            # 方向滑动（屏幕尺寸来自会话缓存）
+            screen_width, screen_height = session.display_size()
+            points = swipe_coordinates(direction, screen_width, screen_height)
+            if points is None:
                 return {
                     "success": False,
                     "error": f"Invalid direction: {direction}"
                 }
+            with span("action"):
+                session.act(lambda d: d.swipe(*points, duration))
         elif all([start_x is not None, start_y is not None, 
                   end_x is not None, end_y is not None]):
             # 坐标滑动
-            d.swipe(start_x, start_y, end_x, end_y, duration)
+            with span("action"):
+                session.act(lambda d: d.swipe(start_x, start_y, end_x, end_y, duration))
         else:
             return {
                 "success": False,
                 "error": "Either direction or all coordinates must be provided"
             }
         
-        # 等待UI更新
-        time.sleep(1)
+        # 等待UI稳定
+        settle_time = wait_for_settle(session)
         
         # 获取滑动后的屏幕信息
-        after_image_path, after_parsed_path, after_screen_info = get_screen_info()
-        after_screen_info = add_click_points(after_screen_info)
+        after_image_path, after_parsed_path, after_screen_info = get_screen_info(session)
+        after_screen_info = screen_payload(session, after_screen_info)
         return {
             "success": True,
             "data": {
+                "settle_time": round(settle_time, 3),
                 "after_swipe": {
                     # "image_path": after_image_path,
                     "parsed_image_path": after_parsed_path,
@@ -202,52 +474,260 @@ def android_swipe(
             "error": str(e)
         }
 
+def scroll_signature(session: DeviceSession, hierarchy: str):
+    """滚动前后比较用的指纹：层级中的文本节点及边界；层级没有文本时使用低分辨率截图"""
+    signature = hierarchy_signature(hierarchy)
+    if signature:
+        return signature
+    return frame_signature(session.screenshot())
+
+def same_scroll_position(previous, current) -> bool:
+    """两次指纹是否一致（内容没有滚动，视为已到列表尽头）"""
+    if isinstance(previous, tuple) or isinstance(current, tuple):
+        return previous == current
+    return frame_difference(previous, current) <= 2.0
+
+@mcp.tool()
+@device_tool()
+def android_scroll_to(
+    text: Optional[str] = None,
+    resource_id: Optional[str] = None,
+    content: Optional[str] = None,
+    exact: bool = False,
+    direction: str = "up",
+    max_swipes: int = 10,
+    duration: float = 0.5,
+    device: Optional[str] = None
+) -> Dict[str, Any]:
+    """滚动直到目标元素出现在屏幕上
+    
+    每次滑动后只读取界面层级检查目标，并比较滑动前后的层级判断是否已到列表尽头；
+    找到目标后才截图解析一次
+    
+    Args:
+        text: 目标文本（匹配 text 或 content-desc）
+        resource_id: 目标 resource-id，可以只写 "/" 之后的 id 名称
+        content: 在文本、content-desc、resource-id 中不区分大小写包含匹配
+        exact: text 是否要求完全相等
+        direction: 滑动方向，与 android_swipe 相同：up 查看下方内容，down 查看上方内容，left/right 横向
+        max_swipes: 最多滑动次数
+        duration: 每次滑动持续时间(秒)
+        device: 设备序列号或地址，为空时使用默认设备
+    """
+    try:
+        if text is None and resource_id is None and content is None:
+            return {
+                "success": False,
+                "error": "One of text, resource_id or content must be provided"
+            }
+        
+        session = get_session(device)
+        screen_width, screen_height = session.display_size()
+        points = swipe_coordinates(direction, screen_width, screen_height)
+        if points is None:
+            return {
+                "success": False,
+                "error": f"Invalid direction: {direction}"
+            }
+        
+        swipes = 0
+        settle_time = 0.0
+        previous = None
+        reason = None
+        while True:
+            # 廉价检查：一次层级 dump，不截图、不调用 OmniParser
+            with span("scroll_check"):
+                hierarchy = session.call(lambda d: d.dump_hierarchy())
+                matches = find_nodes(hierarchy, screen_width, screen_height,
+                                     text=text, resource_id=resource_id, content=content, exact=exact)
+            if matches:
+                break
+            
+            current = scroll_signature(session, hierarchy)
+            if previous is not None and same_scroll_position(previous, current):
+                reason = "end_of_list"
+                break
+            if swipes >= max_swipes:
+                reason = "max_swipes"
+                break
+            previous = current
+            
+            with span("action"):
+                session.act(lambda d: d.swipe(*points, duration))
+            swipes += 1
+            settle_time += wait_for_settle(session)
+        
+        data = {
+            "found": bool(matches),
+            "swipes": swipes,
+            "settle_time": round(settle_time, 3)
+        }
+        if not matches:
+            data["reason"] = reason
+            return {
+                "success": True,
+                "data": data
+            }
+        
+        # 找到目标后才完整解析一次
+        after_image_path, after_parsed_path, after_screen_info = get_screen_info(session)
+        data["target"] = matches[0]
+        data["match_count"] = len(matches)
+        data["after_scroll"] = {
+            # "image_path": after_image_path,
+            "parsed_image_path": after_parsed_path,
+            "screen_info": screen_payload(session, after_screen_info)
+        }
+        return {
+            "success": True,
+            "data": data
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
 @mcp.tool()
-def android_input_text(text: str, clear_before: bool = False, slowly: bool = False) -> Dict[str, Any]:
-    """在当前焦点输入文本
+@device_tool()
+def android_input_text(
+    text: str,
+    clear_before: bool = False,
+    slowly: bool = False,
+    capture: bool = False,
+    device: Optional[str] = None
+) -> Dict[str, Any]:
+    """在当前焦点输入文本，默认只读取焦点输入框校验结果，不截图解析
     
     Args:
         text: 要输入的文本
-        clear_before: 输入前是否清空
+        clear_before: 输入前是否清空（与输入在同一次调用中完成）
         slowly: 是否逐字输入（有打字动画效果）
+        capture: 是否等待界面稳定后返回完整的屏幕信息
+        device: 设备序列号或地址，为空时使用默认设备
     """
     try:
-        d = get_device()
+        session = get_session(device)
+        with span("action"):
+            result = input_text(session, text, clear_before, slowly)
         
-        if clear_before:
-            d.clear_text()
+        data = {
+            "input_text": text,
+            "input_mode": "slowly" if slowly else "fast",
+            "input_method": result["method"],
+            # 焦点输入框的文本，代替完整的截图解析
+            "focused_field": session.input.verify(session, text, clear_before)
+        }
         
-        d.set_input_ime(True)
+        if capture:
+            # 等待输入完成
+            settle_time = wait_for_settle(session)
+            
+            # 获取输入后的屏幕信息
+            after_image_path, after_parsed_path, after_screen_info = get_screen_info(session)
+            after_screen_info = screen_payload(session, after_screen_info)
+            data["settle_time"] = round(settle_time, 3)
+            data["after_input"] = {
+                # "image_path": after_image_path,
+                "parsed_image_path": after_parsed_path,
+                "screen_info": after_screen_info
+            }
         
-        if slowly:
-            # 逐字输入，有打字动画效果
-            for char in text:
-                d.send_keys(char)
-                time.sleep(0.03)  # 每个字符间隔0.03秒
-        else:
-            # 快速输入
-            d.send_keys(text)
+        return {
+            "success": True,
+            "data": data
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+@mcp.tool()
+@device_tool()
+def android_batch(
+    actions: List[Dict[str, Any]],
+    capture: bool = True,
+    stop_on_error: bool = True,
+    device: Optional[str] = None
+) -> Dict[str, Any]:
+    """按顺序连续执行一组动作，只在最后（以及标记了 checkpoint 的步骤后）截图解析
+    
+    Args:
+        actions: 动作列表，每项包含 action 字段及其参数，可选 checkpoint=true 在该步后截图:
+            {"action": "click", "x": 100, "y": 200}
+            {"action": "long_click", "x": 100, "y": 200, "duration": 1.0}
+            {"action": "double_click", "x": 100, "y": 200}
+            {"action": "swipe", "direction": "up"} 或 {"action": "swipe", "start_x": .., "start_y": .., "end_x": .., "end_y": ..}
+            {"action": "text", "text": "hello", "clear_before": false}
+            {"action": "key", "key": "back"}
+            {"action": "wait", "seconds": 0.5} 或 {"action": "wait", "settle": true}
+        capture: 全部执行完后是否截图解析
+        stop_on_error: 某一步失败时是否停止后续动作
+        device: 设备序列号或地址，为空时使用默认设备
+    """
+    try:
+        session = get_session(device)
+        batch_start = time.monotonic()
+        steps = []
+        checkpoints = []
         
-        d.set_input_ime(False)
+        for i, step in enumerate(actions):
+            step_start = time.monotonic()
+            step_result = {"index": i, "action": step.get("action")}
+            try:
+                with span(f"batch.{step.get('action')}"):
+                    run_action(session, step)
+                step_result["success"] = True
+            except Exception as e:
+                step_result["success"] = False
+                step_result["error"] = str(e)
+            step_result["elapsed"] = round(time.monotonic() - step_start, 3)
+            steps.append(step_result)
+            
+            if not step_result["success"] and stop_on_error:
+                break
+            
+            # 检查点：等待稳定后截图
+            if step.get("checkpoint"):
+                settle_time = wait_for_settle(session)
+                _, parsed_path, screen_info = get_screen_info(session)
+                checkpoints.append({
+                    "step": i,
+                    "settle_time": round(settle_time, 3),
+                    "parsed_image_path": parsed_path,
+                    "screen_info": screen_payload(session, screen_info)
+                })
+                step_result["checkpoint_elapsed"] = round(time.monotonic() - step_start - step_result["elapsed"], 3)
         
-        # 等待输入完成
-        time.sleep(0.5)
+        data = {
+            "steps": steps,
+            "completed": sum(1 for step in steps if step["success"]),
+            "total": len(actions),
+            "checkpoints": checkpoints
+        }
         
-        # 获取输入后的屏幕信息
-        after_image_path, after_parsed_path, after_screen_info = get_screen_info()
-        after_screen_info = add_click_points(after_screen_info)
+        # 最后一次截图
+        if capture:
+            settle_time = wait_for_settle(session)
+            _, parsed_path, screen_info = get_screen_info(session)
+            data["after_batch"] = {
+                "settle_time": round(settle_time, 3),
+                "parsed_image_path": parsed_path,
+                "screen_info": screen_payload(session, screen_info)
+            }
+        data["total_time"] = round(time.monotonic() - batch_start, 3)
         
+        failed = [step for step in steps if not step["success"]]
+        if failed:
+            return {
+                "success": False,
+                "error": f"Step {failed[0]['index']} ({failed[0]['action']}) failed: {failed[0]['error']}",
+                "data": data
+            }
         return {
             "success": True,
-            "data": {
-                "input_text": text,
-                "input_mode": "slowly" if slowly else "fast",
-                "after_input": {
-                    # "image_path": after_image_path,
-                    "parsed_image_path": after_parsed_path,
-                    "screen_info": after_screen_info
-                }
-            }
+            "data": data
         }
     except Exception as e:
         return {
@@ -256,23 +736,30 @@ def android_input_text(text: str, clear_before: bool = False, slowly: bool = Fal
         }
 
 @mcp.tool()
-def android_back() -> Dict[str, Any]:
-    """Android返回键操作"""
+@device_tool()
+def android_back(device: Optional[str] = None) -> Dict[str, Any]:
+    """Android返回键操作
+    
+    Args:
+        device: 设备序列号或地址，为空时使用默认设备
+    """
     try:
-        d = get_device()
-        d.press("back")
+        session = get_session(device)
+        with span("action"):
+            session.act(lambda d: d.press("back"))
         
-        # 等待UI更新
-        time.sleep(0.5)
+        # 等待UI稳定
+        settle_time = wait_for_settle(session)
         
         # 获取操作后的屏幕信息
-        after_image_path, after_parsed_path, after_screen_info = get_screen_info()
-        after_screen_info = add_click_points(after_screen_info)
+        after_image_path, after_parsed_path, after_screen_info = get_screen_info(session)
+        after_screen_info = screen_payload(session, after_screen_info)
         
         return {
             "success": True,
             "data": {
                 "action": "back",
+                "settle_time": round(settle_time, 3),
                 "after_action": {
                     # "image_path": after_image_path,
                     "parsed_image_path": after_parsed_path,
@@ -287,23 +774,30 @@ def android_back() -> Dict[str, Any]:
         }
 
 @mcp.tool()
-def android_home() -> Dict[str, Any]:
-    """回到Android主屏幕"""
+@device_tool()
+def android_home(device: Optional[str] = None) -> Dict[str, Any]:
+    """回到Android主屏幕
+    
+    Args:
+        device: 设备序列号或地址，为空时使用默认设备
+    """
     try:
-        d = get_device()
-        d.press("home")
+        session = get_session(device)
+        with span("action"):
+            session.act(lambda d: d.press("home"))
         
-        # 等待UI更新
-        time.sleep(1)
+        # 等待UI稳定
+        settle_time = wait_for_settle(session)
         
         # 获取操作后的屏幕信息
-        after_image_path, after_parsed_path, after_screen_info = get_screen_info()
-        after_screen_info = add_click_points(after_screen_info)
+        after_image_path, after_parsed_path, after_screen_info = get_screen_info(session)
+        after_screen_info = screen_payload(session, after_screen_info)
         
         return {
             "success": True,
             "data": {
                 "action": "home",
+                "settle_time": round(settle_time, 3),
                 "after_action": {
                     # "image_path": after_image_path,
                     "parsed_image_path": after_parsed_path,
@@ -318,30 +812,34 @@ def android_home() -> Dict[str, Any]:
         }
 
 @mcp.tool()
-def android_long_click(x: int, y: int, duration: float = 1.0) -> Dict[str, Any]:
+@device_tool()
+def android_long_click(x: int, y: int, duration: float = 1.0, device: Optional[str] = None) -> Dict[str, Any]:
     """长按Android屏幕指定坐标
     
     Args:
         x: X坐标
         y: Y坐标
         duration: 长按时间(秒)
+        device: 设备序列号或地址，为空时使用默认设备
     """
     try:
-        d = get_device()
-        d.long_click(x, y, duration)
+        session = get_session(device)
+        with span("action"):
+            session.act(lambda d: d.long_click(x, y, duration))
         
-        # 等待UI更新
-        time.sleep(0.5)
+        # 等待UI稳定
+        settle_time = wait_for_settle(session)
         
         # 获取操作后的屏幕信息
-        after_image_path, after_parsed_path, after_screen_info = get_screen_info()
-        after_screen_info = add_click_points(after_screen_info)
+        after_image_path, after_parsed_path, after_screen_info = get_screen_info(session)
+        after_screen_info = screen_payload(session, after_screen_info)
         
         return {
             "success": True,
             "data": {
                 "long_clicked_position": {"x": x, "y": y},
                 "duration": duration,
+                "settle_time": round(settle_time, 3),
                 "after_long_click": {
                     # "image_path": after_image_path,
                     "parsed_image_path": after_parsed_path,
@@ -356,28 +854,32 @@ def android_long_click(x: int, y: int, duration: float = 1.0) -> Dict[str, Any]:
         }
 
 @mcp.tool()
-def android_double_click(x: int, y: int) -> Dict[str, Any]:
+@device_tool()
+def android_double_click(x: int, y: int, device: Optional[str] = None) -> Dict[str, Any]:
     """双击Android屏幕指定坐标
     
     Args:
         x: X坐标
         y: Y坐标
+        device: 设备序列号或地址，为空时使用默认设备
     """
     try:
-        d = get_device()
-        d.double_click(x, y)
+        session = get_session(device)
+        with span("action"):
+            session.act(lambda d: d.double_click(x, y))
         
-        # 等待UI更新
-        time.sleep(0.5)
+        # 等待UI稳定
+        settle_time = wait_for_settle(session)
         
         # 获取操作后的屏幕信息
-        after_image_path, after_parsed_path, after_screen_info = get_screen_info()
-        after_screen_info = add_click_points(after_screen_info)
+        after_image_path, after_parsed_path, after_screen_info = get_screen_info(session)
+        after_screen_info = screen_payload(session, after_screen_info)
         
         return {
             "success": True,
             "data": {
                 "double_clicked_position": {"x": x, "y": y},
+                "settle_time": round(settle_time, 3),
                 "after_double_click": {
                     # "image_path": after_image_path,
                     "parsed_image_path": after_parsed_path,
@@ -392,31 +894,35 @@ def android_double_click(x: int, y: int) -> Dict[str, Any]:
         }
 
 @mcp.tool()
-def android_launch_app(package_name: str) -> Dict[str, Any]:
+@device_tool()
+def android_launch_app(package_name: str, device: Optional[str] = None) -> Dict[str, Any]:
     """直接通过包名启动Android应用
     
     Args:
         package_name: 应用包名 (如 com.tencent.wework)
+        device: 设备序列号或地址，为空时使用默认设备
     """
     try:
-        d = get_device()
-        d.app_start(package_name)
+        session = get_session(device)
+        with span("action"):
+            session.act(lambda d: d.app_start(package_name))
         
         # 等待应用启动
-        time.sleep(2)
+        settle_time = wait_for_settle(session, timeout=config.SETTLE_LAUNCH_TIMEOUT)
         
         # 获取启动后的屏幕信息
-        after_image_path, after_parsed_path, after_screen_info = get_screen_info()
-        after_screen_info = add_click_points(after_screen_info)
+        after_image_path, after_parsed_path, after_screen_info = get_screen_info(session)
+        after_screen_info = screen_payload(session, after_screen_info)
         
         # 获取当前应用信息
-        current_app = d.app_current()
+        current_app = session.call(lambda d: d.app_current())
         
         return {
             "success": True,
             "data": {
                 "launched_app": package_name,
                 "current_app": current_app,
+                "settle_time": round(settle_time, 3),
                 "after_launch": {
                     "parsed_image_path": after_parsed_path,
                     "screen_info": after_screen_info
@@ -430,36 +936,44 @@ def android_launch_app(package_name: str) -> Dict[str, Any]:
         }
 
 @mcp.tool()
-def android_list_apps(filter_type: str = "all") -> Dict[str, Any]:
-    """列出设备上的应用
+@device_tool(exclusive=False)
+def android_list_apps(filter_type: str = "all", refresh: bool = False, device: Optional[str] = None) -> Dict[str, Any]:
+    """列出设备上的应用（来自缓存的应用目录）
     
     Args:
         filter_type: 过滤类型 (all/running/user)
+        refresh: 是否强制重新读取设备上的应用列表
+        device: 设备序列号或地址，为空时使用默认设备
     """
     try:
-        d = get_device()
-        
-        if filter_type == "all":
-            apps = d.app_list()
-        elif filter_type == "running":
-            apps = d.app_list_running()
-        elif filter_type == "user":
-            # 过滤出用户应用（排除系统应用）
-            all_apps = d.app_list()
-            apps = [app for app in all_apps if not app.startswith("com.android.") 
-                   and not app.startswith("com.google.android.")]
-        else:
+        session = get_session(device)
+        
+        if filter_type not in ("all", "running", "user"):
             return {
                 "success": False,
                 "error": f"Invalid filter_type: {filter_type}"
             }
         
+        catalog = session.app_catalog_ready(force=refresh)
+        if filter_type == "running":
+            apps = sorted(session.call(lambda d: d.app_list_running()))
+        else:
+            apps = [entry.package for entry in catalog.apps(user_only=filter_type == "user")]
+        
+        # 已知名称的应用附带名称
+        labels = {}
+        for package in apps:
+            entry = catalog.get(package)
+            if entry is not None and entry.label:
+                labels[package] = entry.label
+        
         return {
             "success": True,
             "data": {
                 "filter_type": filter_type,
                 "total_count": len(apps),
-                "apps": apps
+                "apps": apps,
+                "labels": labels
             }
         }
     except Exception as e:
@@ -469,44 +983,27 @@ def android_list_apps(filter_type: str = "all") -> Dict[str, Any]:
         }
 
 @mcp.tool()
-def android_search_app(keyword: str) -> Dict[str, Any]:
-    """按名称搜索应用
+@device_tool(exclusive=False)
+def android_search_app(keyword: str, limit: int = 20, device: Optional[str] = None) -> Dict[str, Any]:
+    """按名称、拼音或包名搜索应用（支持模糊匹配）
     
     Args:
-        keyword: 搜索关键词
+        keyword: 搜索关键词，如 微信、weixin、wx、wework
+        limit: 最多返回的数量
+        device: 设备序列号或地址，为空时使用默认设备
     """
     try:
-        d = get_device()
-        all_apps = d.app_list()
-        
-        # 搜索包含关键词的应用（不区分大小写）
-        keyword_lower = keyword.lower()
-        matched_apps = []
-        
-        for app in all_apps:
-            # 检查包名是否包含关键词
-            if keyword_lower in app.lower():
-                matched_apps.append(app)
-            # 特殊匹配规则
-            elif keyword == "企业微信" and "wework" in app.lower():
-                matched_apps.append(app)
-            elif keyword == "微信" and app == "com.tencent.mm":
-                matched_apps.append(app)
-            elif keyword == "支付宝" and "alipay" in app.lower():
-                matched_apps.append(app)
-            elif keyword == "淘宝" and "taobao" in app.lower():
-                matched_apps.append(app)
-            elif keyword == "美团" and "meituan" in app.lower():
-                matched_apps.append(app)
-            elif keyword == "饿了么" and "eleme" in app.lower():
-                matched_apps.append(app)
+        session = get_session(device)
+        catalog = session.app_catalog_ready()
+        matches = catalog.search(keyword, limit=limit)
         
         return {
             "success": True,
             "data": {
                 "keyword": keyword,
-                "matched_count": len(matched_apps),
-                "matched_apps": matched_apps
+                "matched_count": len(matches),
+                "matched_apps": [entry.package for entry, _ in matches],
+                "matches": [dict(entry.as_dict(), score=score) for entry, score in matches]
             }
         }
     except Exception as e:
@@ -516,14 +1013,20 @@ def android_search_app(keyword: str) -> Dict[str, Any]:
         }
 
 @mcp.tool()
-def android_app_info() -> Dict[str, Any]:
-    """获取当前运行应用信息"""
+@device_tool(exclusive=False)
+def android_app_info(device: Optional[str] = None) -> Dict[str, Any]:
+    """获取当前运行应用信息
+    
+    Args:
+        device: 设备序列号或地址，为空时使用默认设备
+    """
     try:
-        d = get_device()
-        current_app = d.app_current()
+        session = get_session(device)
+        current_app = session.call(lambda d: d.app_current())
         
-        # 获取更多设备信息
-        device_info = d.info
+        # 设备信息来自会话缓存，不再每次读取
+        device_info = session.device_info
+        width, height = session.display_size()
         
         return {
             "success": True,
@@ -534,7 +1037,7 @@ def android_app_info() -> Dict[str, Any]:
                     "model": device_info.get("model"),
                     "sdk": device_info.get("sdk"),
                     "android_version": device_info.get("version"),
-                    "display_size": f"{device_info.get('displayWidth')}x{device_info.get('displayHeight')}"
+                    "display_size": f"{width}x{height}"
                 }
             }
         }
@@ -545,31 +1048,34 @@ def android_app_info() -> Dict[str, Any]:
         }
 
 @mcp.tool()
-def android_force_stop_app(package_name: str) -> Dict[str, Any]:
+@device_tool()
+def android_force_stop_app(package_name: str, device: Optional[str] = None) -> Dict[str, Any]:
     """强制停止应用
     
     Args:
         package_name: 应用包名
+        device: 设备序列号或地址，为空时使用默认设备
     """
     try:
-        d = get_device()
-        d.app_stop(package_name)
+        session = get_session(device)
+        session.act(lambda d: d.app_stop(package_name))
         
         # 等待应用停止
-        time.sleep(1)
+        settle_time = wait_for_settle(session)
         
         # 获取停止后的屏幕信息
-        after_image_path, after_parsed_path, after_screen_info = get_screen_info()
-        after_screen_info = add_click_points(after_screen_info)
+        after_image_path, after_parsed_path, after_screen_info = get_screen_info(session)
+        after_screen_info = screen_payload(session, after_screen_info)
         
         # 获取当前应用信息（确认是否已停止）
-        current_app = d.app_current()
+        current_app = session.call(lambda d: d.app_current())
         
         return {
             "success": True,
             "data": {
                 "stopped_app": package_name,
                 "current_app": current_app,
+                "settle_time": round(settle_time, 3),
                 "after_stop": {
                     "parsed_image_path": after_parsed_path,
                     "screen_info": after_screen_info
@@ -582,6 +1088,183 @@ def android_force_stop_app(package_name: str) -> Dict[str, Any]:
             "error": str(e)
         }
 
+@mcp.tool()
+@device_tool(exclusive=False)
+def android_list_devices() -> Dict[str, Any]:
+    """列出通过 adb 连接的设备以及已建立会话的设备"""
+    try:
+        connected = registry.connected_serials()
+        sessions = [serial for serial in registry.sessions() if serial]
+        
+        return {
+            "success": True,
+            "data": {
+                "connected_count": len(connected),
+                "connected_devices": connected,
+                "active_sessions": sessions
+            }
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+@mcp.tool()
+async def android_run_on_devices(
+    tool: str,
+    devices: Optional[List[str]] = None,
+    arguments: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """在多台设备上并发执行同一个工具（截图或操作），每台设备使用独立的会话、锁和缓存
+    
+    Args:
+        tool: 工具名称，如 android_get_screen_info、android_click、android_launch_app
+        devices: 设备序列号或地址列表，为空时使用所有通过 adb 连接的设备
+        arguments: 传给工具的参数（不含 device）
+    """
+    started = time.perf_counter()
+    try:
+        handler = MULTI_DEVICE_TOOLS.get(tool)
+        if handler is None:
+            return {
+                "success": False,
+                "error": f"Unsupported tool: {tool}"
+            }
+        
+        if not devices:
+            devices = await run_blocking(registry.connected_serials)
+        arguments = {k: v for k, v in (arguments or {}).items() if k != "device"}
+        
+        # 每台设备持有各自的设备锁，彼此并发执行
+        results = await asyncio.gather(
+            *(handler(device=serial, **arguments) for serial in devices),
+            return_exceptions=True
+        )
+        
+        return {
+            "success": True,
+            "data": {
+                "tool": tool,
+                "device_count": len(devices),
+                "results": {
+                    serial: result if not isinstance(result, Exception) else {
+                        "success": False,
+                        "error": str(result)
+                    }
+                    for serial, result in zip(devices, results)
+                }
+            }
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
+    finally:
+        metrics.observe("tool", "android_run_on_devices", time.perf_counter() - started)
+
+@mcp.tool()
+async def android_captures(capture_id: Optional[str] = None,
+                           since: Optional[float] = None,
+                           until: Optional[float] = None,
+                           kind: Optional[str] = None,
+                           limit: int = 20) -> Dict[str, Any]:
+    """查找截图存储中保存的截图和标注图片
+    
+    Args:
+        capture_id: 截图 ID，指定时返回该次截图的全部文件
+        since: 起始时间（Unix 时间戳，秒）
+        until: 结束时间（Unix 时间戳，秒）
+        kind: 只返回该类型：screen（原始截图）或 labeled（标注图片）
+        limit: 最多返回的数量，最新的在前
+    """
+    try:
+        store = get_capture_store()
+        if capture_id:
+            records = [r for r in (store.get(capture_id, k) for k in ("screen", "labeled")) if r is not None]
+            if kind:
+                records = [r for r in records if r.kind == kind]
+        else:
+            records = store.find(since=since, until=until, kind=kind, limit=limit)
+        
+        return {
+            "success": True,
+            "data": {
+                "captures": [record.as_dict() for record in records],
+                "store": store.stats()
+            }
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+@mcp.tool()
+async def android_metrics(format: str = "json", reset: bool = False) -> Dict[str, Any]:
+    """获取各阶段和各工具的耗时统计（最近若干次调用的 p50/p95/p99）
+    
+    Args:
+        format: json 返回按阶段/工具分组的统计（毫秒），prometheus 返回 Prometheus 文本格式（秒）
+        reset: 读取后是否清空统计
+    """
+    try:
+        if format not in ("json", "prometheus"):
+            return {
+                "success": False,
+                "error": f"Invalid format: {format}"
+            }
+        
+        if format == "prometheus":
+            data = metrics.prometheus()
+        else:
+            data = metrics.snapshot()
+            data["parser"] = get_parser().breaker.snapshot()
+            # 每台设备的解析缓存命中统计
+            data["parse_cache"] = {serial: session.parse_cache.stats()
+                                   for serial, session in registry.sessions().items()}
+        if reset:
+            metrics.reset()
+            for session in registry.sessions().values():
+                session.parse_cache.reset_stats()
+        
+        return {
+            "success": True,
+            "data": data
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+# 可以通过 android_run_on_devices 在多台设备上执行的工具
+MULTI_DEVICE_TOOLS = {
+    handler.__name__: handler
+    for handler in [
+        android_get_screen_info,
+        android_get_labeled_image,
+        android_element_at,
+        android_elements_in_region,
+        android_nearest_element,
+        android_click,
+        android_swipe,
+        android_scroll_to,
+        android_input_text,
+        android_batch,
+        android_back,
+        android_home,
+        android_long_click,
+        android_double_click,
+        android_launch_app,
+        android_list_apps,
+        android_search_app,
+        android_app_info,
+        android_force_stop_app,
+    ]
+}
+
 # 主程序入口
 if __name__ == "__main__":
     # 运行服务器
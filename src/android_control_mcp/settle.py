@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+界面稳定检测
+操作后轮询廉价信号，直到连续多次采样不再变化，替代固定的 time.sleep
+"""
+
+import hashlib
+import time
+from typing import Any, Dict, Optional, Sequence
+from . import config
+from .device_session import DeviceSession
+from .metrics import timed
+from .screen_state import frame_difference, frame_signature
+
+
+def _sample(session: DeviceSession, signals: Sequence[str]) -> Optional[Dict[str, Any]]:
+    """采集一次信号，失败时返回 None（视为仍在变化）"""
+    sample = {}
+    try:
+        if "frame" in signals:
+            # 只使用视频流帧或设备端缩略图，没有廉价画面时跳过该信号
+            frame = session.capture.sample(session)
+            if frame is not None:
+                sample["frame"] = frame_signature(frame)
+        if "activity" in signals or (not sample and "hierarchy" not in signals):
+            current_app = session.call(lambda d: d.app_current())
+            sample["activity"] = (current_app.get("package"), current_app.get("activity"))
+        if "hierarchy" in signals:
+            hierarchy = session.call(lambda d: d.dump_hierarchy(compressed=True))
+            sample["hierarchy"] = hashlib.md5(hierarchy.encode("utf-8")).hexdigest()
+    except Exception as e:
+        print(f"界面稳定检测采样失败: {e}")
+        return None
+    return sample
+
+
+def _is_same(previous: Dict[str, Any], current: Dict[str, Any], frame_threshold: float) -> bool:
+    if previous.keys() != current.keys():
+        return False
+    for key, value in current.items():
+        if key == "frame":
+            if frame_difference(previous[key], value) > frame_threshold:
+                return False
+        elif previous[key] != value:
+            return False
+    return True
+
+
+@timed("settle")
+def wait_for_settle(session: DeviceSession,
+                    timeout: float = config.SETTLE_TIMEOUT,
+                    stable_frames: int = config.SETTLE_STABLE_FRAMES,
+                    interval: float = config.SETTLE_INTERVAL,
+                    min_wait: float = config.SETTLE_MIN_WAIT,
+                    signals: Sequence[str] = config.SETTLE_SIGNALS,
+                    frame_threshold: float = 2.0) -> float:
+    """
+    等待界面稳定
+
+    Args:
+        session: 设备会话
+        timeout: 最长等待时间(秒)
+        stable_frames: 需要连续多少次采样与上一次一致
+        interval: 两次采样之间的间隔(秒)
+        min_wait: 开始采样前的最短等待，给动画启动留出时间(秒)
+        signals: 使用的信号 (frame=视频流帧或设备端缩略图的差异, activity=前台窗口, hierarchy=界面层级哈希)
+        frame_threshold: 低分辨率帧平均像素差的阈值
+
+    Returns:
+        float: 实际等待的时间(秒)
+    """
+    start = time.monotonic()
+    if min_wait > 0:
+        time.sleep(min_wait)
+
+    previous = None
+    stable = 0
+    while True:
+        current = _sample(session, signals)
+        if previous is not None and current is not None and _is_same(previous, current, frame_threshold):
+            stable += 1
+        else:
+            stable = 0
+        previous = current
+
+        elapsed = time.monotonic() - start
+        if stable >= stable_frames:
+            return elapsed
+        if elapsed >= timeout:
+            print(f"界面在 {timeout}s 内未稳定，继续执行")
+            return elapsed
+        time.sleep(interval)
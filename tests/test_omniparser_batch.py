@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+OmniParser 批量解析测试
+使用 benchmarks 中的本地替身服务，检查批量接口的结果顺序，以及服务端不支持批量接口时的回退
+"""
+
+import io
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from android_control_mcp.omniparser import OmniParser
+from fake_device import synthetic_screens
+from stub_parser import StubParser
+
+
+# 画面差异明显的屏幕，替身服务可以准确匹配
+SCREEN_NAMES = ["桌面", "详情", "日历", "锁屏"]
+
+
+@pytest.fixture(scope="module")
+def screens():
+    return synthetic_screens((540, 960))
+
+
+def _png(image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _parse_many(screens, batch: bool):
+    stub = StubParser(screens, base_delay=0, delay_per_megapixel=0, batch=batch).start()
+    parser = OmniParser(stub.url, health_interval=0)
+    try:
+        # 倒序上传，确认结果按上传顺序而不是屏幕顺序返回
+        names = list(reversed(SCREEN_NAMES))
+        results = parser.parse_many([_png(screens[name].image) for name in names])
+        return stub, parser, names, results
+    finally:
+        parser.close()
+        stub.stop()
+
+
+def test_batch_results_keep_upload_order(screens):
+    stub, parser, names, results = _parse_many(screens, batch=True)
+
+    assert [result["elements"] for result in results] == [screens[name].elements for name in names]
+    assert stub.batch_requests == 1
+    assert stub.requests == 1
+    assert parser.batch_supported is True
+
+
+def test_falls_back_to_concurrent_parse_without_batch_endpoint(screens):
+    stub, parser, names, results = _parse_many(screens, batch=False)
+
+    assert [result["elements"] for result in results] == [screens[name].elements for name in names]
+    assert parser.batch_supported is False
+    # 批量接口返回 404，不计入请求数；之后每张图片一次 /parse
+    assert stub.batch_requests == 0
+    assert stub.requests == len(names)